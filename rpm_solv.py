@@ -15,21 +15,39 @@ import argparse
 import configparser
 import re
 import json
+import time
 
 
 from utils.job import JobSolver
+from utils.evr import evr_ladder
 
 from utils.repo import dir_path, \
         repo_repomd, \
         load_stub, \
         repo_system, \
-        repo_installed
+        repo_installed, \
+        repo_cmdline, \
+        prefetch_repos
+
+from utils.cache import solv_cache, \
+        cache_size, \
+        pool_snapshot
 
 from utils.problem import InteractiveSolver, \
         MultiversionProblemSolver, \
         ProblemSolver
 
-from utils.format import data_json 
+from utils.format import data_json, data_sqlite, advisory_index
+
+from utils.server import solve_service
+
+from utils.partition import solve_partitioned
+from utils.trace import problem_trace
+from utils.checkpoint import problem_checkpoint
+from utils.fixcache import fix_cache
+from utils.batch import read_requests, \
+        solve_batch, \
+        solve_batch_parallel
 
 #import gc
 #gc.set_debug(gc.DEBUG_LEAK)
@@ -38,6 +56,270 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+def read_repos(args, cache, releasever):
+    """
+    read all repo configs
+    """
+    repos = []
+    reposdir = args.repodir
+    for repo_file in sorted(glob.glob('%s/*.repo' % reposdir)):
+        config = configparser.ConfigParser()
+        config.read(repo_file)
+        for section in config.sections():
+            repoattr = {'enabled': 0, 'priority': 99, 'autorefresh': 1, 'type': 'rpm', 'metadata_expire': "900"}
+            repoattr.update(config[section])
+            if repoattr['type'] == 'rpm':
+                repo = repo_repomd(section, 'repomd', repoattr, 
+                                   cache = cache,
+                                   basearch = args.basearch,
+                                   releasever = releasever)
+                repos.append(repo)
+    return repos
+
+def load_pool(args, cache, repos, rpms=()):
+    """
+    Load enabled repos and commandline rpms
+    into a new pool ready to solve jobs
+    """
+    pool = solv.Pool()
+    pool.setarch(args.basearch)
+    pool.set_loadcallback(load_stub)
+
+    enabled_repos = [repo for repo in repos if int(repo['enabled'])]
+
+    snapshot = None
+    prepared = False
+    # commandline rpms are not part of the snapshot
+    if args.snapshot and not rpms:
+        snapshot = pool_snapshot(cache, args.basearch)
+        key = snapshot.key(enabled_repos)
+        if key:
+            prepared = snapshot.load(pool, enabled_repos, key)
+
+    if not prepared and args.jobs > 1:
+        # download and parse repos in worker processes
+        # to populate the solv cache files
+        # the pool is only filled from the main process
+        prefetch_repos(enabled_repos, args.basearch, args.jobs)
+
+    # now load all enabled repos into the pool
+    if not prepared:
+        for repo in enabled_repos:
+            repo.load(pool)
+    
+    cmdlinerepo = None
+    for arg in rpms:
+        if not cmdlinerepo:
+            cmdlinerepo = repo_cmdline('@commandline', 'cmdline')
+            cmdlinerepo.load(pool)
+            cmdlinerepo['packages'] = {}
+        s = cmdlinerepo.handle.add_rpm(arg, solv.Repo.REPO_REUSE_REPODATA|solv.Repo.REPO_NO_INTERNALIZE)
+        if not s:
+            print(pool.errstr)
+            sys.exit(1)
+        cmdlinerepo['packages'][arg] = s
+
+    if cmdlinerepo:
+        cmdlinerepo.handle.internalize()
+
+    if not prepared:
+        addedprovides = pool.addfileprovides_queue()
+        if addedprovides:
+            #sysrepo.updateaddedprovides(addedprovides)
+            for repo in repos:
+                repo.updateaddedprovides(addedprovides)
+
+    pool.createwhatprovides()
+    
+    if not prepared:
+        # FIXME: workaroud to have less 
+        # confict to solve 
+        # this helps to keep as much packages
+        # as possible in the data.json
+        logger.debug('Remove SOLVABLE_CONFLICTS SOLVABLE_OBSOLETES from pool')
+        for s in pool.solvables:
+            s.unset(solv.SOLVABLE_CONFLICTS)
+            s.unset(solv.SOLVABLE_OBSOLETES)
+            #s.unset(solv.SOLVABLE_FILELIST)
+
+        if snapshot:
+            key = snapshot.key(enabled_repos)
+            if key:
+                snapshot.write(pool, enabled_repos, key)
+
+    # build the evr index once
+    # (shared by forked workers)
+    evr_ladder.get(pool)
+    if args.reportupdateinfo:
+        advisory_index.get(pool)
+    return pool
+
+def build_report(dw, solvables, updateinfo=False, weakened=(), output=None, 
+        diff=None, diff_only=False):
+    """
+    return the report of solvables
+    or stream it into output (return True)
+    weakened packages (jobs weakened once the solving 
+    budget was exhausted) are flagged
+    diff: (previous data.json, delta output) tuple
+    diff_only skips the full report (return True)
+    """
+    if weakened:
+        print("Weakened jobs solvables: `{}`".format(len(weakened)))
+    if diff:
+        previous, diff_output = diff
+        logger.info('Compare data output to `{}`'.format(previous))
+        delta = dw.diff(previous, solvables, updateinfo=updateinfo, weakened=weakened)
+        with open(diff_output, 'w', encoding='utf-8') as f:
+            json.dump(delta, f, ensure_ascii=False, indent=4)
+        print("Report diff: `{}` added, `{}` removed, `{}` changed".format(
+            len(delta['added']), len(delta['removed']), len(delta['changed'])))
+        if diff_only:
+            return True
+    logger.info('Build data output')
+    if output:
+        dw.write(output, solvables, updateinfo=updateinfo, weakened=weakened)
+        return True
+    return dw.format(solvables, updateinfo=updateinfo, weakened=weakened)
+
+def solve_packages(pool, repos, packages, weak=False, updateinfo=False, verbose=0, 
+        multifix=False, partition=False, workers=1, trace=None, checkpoint=None,
+        fixcache=None, max_time=None, max_iterations=None, output=None,
+        data_writer=data_json, diff=None, diff_only=False):
+    """
+    Solve packages dependencies 
+    and return data_json report 
+    None means nothing to do
+    partition solves independent jobs components 
+    separately (in forked workers when workers > 1)
+    trace is an optional problem_trace
+    checkpoint is an optional problem_checkpoint
+    fixcache is the solv_cache keeping the learned fixes (optional)
+    max_time (seconds) and max_iterations bound the problem loop,
+    the remaining problematic jobs are weakened afterwards
+    output streams the report into a file (return True)
+    using data_writer (data_json or data_sqlite)
+    diff and diff_only: see build_report
+    """
+    # problems_class = interactive
+    problems_class = MultiversionProblemSolver
+
+    # action_solver = solv.Job.SOLVER_DISTUPGRADE
+    # action_solver = solv.Job.SOLVER_UPDATE
+    # use a fake install to force full rpm depedencies 
+    action_solver = solv.Job.SOLVER_INSTALL
+
+    action_solver |= solv.Job.SOLVER_CLEANDEPS
+    # action_solver |= solv.Job.SOLVER_FORCEBEST
+    if weak:
+        action_solver |= solv.Job.SOLVER_WEAK
+
+    logger.info('Build job stack')
+    # convert arguments into jobs
+    js = JobSolver(pool, repos, action_solver)
+    jobs = js.get_jobs_from_packages(packages) 
+    
+    if not jobs:
+        print("no package matched.")
+        sys.exit(1)
+
+    if verbose > 2:
+        pool.set_debuglevel(verbose-2)
+    
+    logger.info('Solv jobs')
+    fixes = None
+    if fixcache is not None:
+        fixes = fix_cache(fixcache, packages, weak)
+    problem_solver = problems_class(pool, multifix=multifix, trace=trace, 
+            checkpoint=checkpoint, fixcache=fixes, 
+            max_time=max_time, max_iterations=max_iterations)
+    if partition:
+        try:
+            ids, changes, weakened = solve_partitioned(pool, jobs, 
+                    lambda pool, multiversion: problems_class(pool, multiversion=multiversion,
+                        multifix=multifix, trace=trace,
+                        max_time=max_time, max_iterations=max_iterations), 
+                    workers)
+            # replay the components deps changes 
+            # so the report matches the solved pool
+            problem_solver.import_pool_changes(changes)
+            merged = [pool.Job(action_solver | solv.Job.SOLVER_SOLVABLE, i) for i in ids]
+            # components share reverse deps, the multiversion 
+            # alignment is only checked across the merged solvables
+            aligned = problem_solver.align_merged(merged) if merged else None
+            if aligned is not None:
+                # a shared dependency was aligned to a newer 
+                # version, its deps must be solved again
+                start = time.monotonic()
+                solver = problem_solver.run_problem_loop(aligned)
+                trans = solver.transaction()
+                del solver
+                ids = []
+                for cl in trans.classify(solv.Transaction.SOLVER_TRANSACTION_SHOW_OBSOLETES |
+                        solv.Transaction.SOLVER_TRANSACTION_OBSOLETE_IS_UPGRADE):
+                    if cl.type == solv.Transaction.SOLVER_TRANSACTION_INSTALL:
+                        ids += [s.id for s in cl.solvables()]
+                weakened += problem_solver.weakened
+                print("Cross components alignment solved " \
+                        "in `{:.1f}`s".format(time.monotonic() - start))
+            if not ids:
+                print("Nothing to do.")
+                return None
+            print('')
+            print("Transaction summary:")
+            print('')
+            print("%d installed packages:" % len(ids))
+            return build_report(data_writer(pool), [pool.solvables[i] for i in ids], 
+                    updateinfo=updateinfo, weakened=weakened, output=output,
+                    diff=diff, diff_only=diff_only)
+        finally:
+            problem_solver.restore_pool()
+    try:
+        solver = problem_solver.run_problem_loop(jobs)
+        if fixes is not None:
+            fixes.save()
+
+        # no problems, show transaction
+        trans = solver.transaction()
+        del solver
+        if trans.isempty():
+            print("Nothing to do.")
+            return None
+        
+        data = []
+        print('')
+        print("Transaction summary:")
+        print('')
+        for cl in trans.classify(solv.Transaction.SOLVER_TRANSACTION_SHOW_OBSOLETES | solv.Transaction.SOLVER_TRANSACTION_OBSOLETE_IS_UPGRADE):
+            if cl.type == solv.Transaction.SOLVER_TRANSACTION_ERASE:
+                print("%d erased packages:" % cl.count)
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_INSTALL:
+                print("%d installed packages:" % cl.count)
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_REINSTALLED:
+                print("%d reinstalled packages:" % cl.count)
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_DOWNGRADED:
+                print("%d downgraded packages:" % cl.count)
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_CHANGED:
+                print("%d changed packages:" % cl.count)
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_UPGRADED:
+                print("%d upgraded packages:" % cl.count)
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_VENDORCHANGE:
+                print("%d vendor changes from '%s' to '%s':" % (cl.count, cl.fromstr, cl.tostr))
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_ARCHCHANGE:
+                print("%d arch changes from '%s' to '%s':" % (cl.count, cl.fromstr, cl.tostr))
+            else:
+                continue
+             
+            print("install size change: %d K" % trans.calc_installsizechange())
+            data = build_report(data_writer(pool), cl.solvables(), updateinfo=updateinfo, 
+                    weakened=problem_solver.weakened, output=output,
+                    diff=diff, diff_only=diff_only)
+        return data
+    finally:
+        # revert deps removed by the problem loop
+        # the pool may be used for other solvings
+        problem_solver.restore_pool()
+
 def main():
     parser = argparse.ArgumentParser(description="RPM cli dependency solver") 
     parser.add_argument('--repodir', 
@@ -50,7 +332,7 @@ def main():
                         type=str, help="Release version")
     parser.add_argument('--output', default="./", 
                         help="Directory to use for json export")
-    parser.add_argument('packages', type=str, nargs='+',
+    parser.add_argument('packages', type=str, nargs='*',
                          help='list of packages or solvable glob expression.\n' \
                               'It accepts `repo:` and `selection:` prexif.')
     parser.add_argument('--weak', action='store_true', default=False,
@@ -60,9 +342,104 @@ def main():
     parser.add_argument('--reportupdateinfo', action='store_true', default=False,
                          help="Enable updateinfo report to json output")
     
+    parser.add_argument('--cachedir', default='/var/cache/solv',
+                         type=str, help="solv cache directory")
+    parser.add_argument('--cachesize', default='0', type=cache_size,
+                         help="Max solv cache size (i.e: 500M, 10G). " \
+                             "Least recently used files are evicted first. " \
+                             "0 means unlimited")
+    parser.add_argument('--snapshot', action='store_true', default=False,
+                         help="Load the prepared pool from a single snapshot file " \
+                             "keyed by repo cookies and basearch " \
+                             "(created on the first run)")
+    parser.add_argument('--multifix', action='store_true', default=False,
+                         help="Apply every non overlapping problem fix " \
+                             "of a solver pass instead of the first rule " \
+                             "of each problem")
+    parser.add_argument('--trace', default=None, type=str, metavar='FILE',
+                         help="Write one JSON record per problem loop iteration " \
+                             "(problems, rules, fixes, timings, pool mutations)")
+    parser.add_argument('--checkpoint', default=None, type=str, metavar='FILE',
+                         help="Save the problem loop state into FILE " \
+                             "every --checkpoint-every iterations")
+    parser.add_argument('--checkpoint-every', default=100, type=int, metavar='N',
+                         dest='checkpoint_every',
+                         help="Problem loop iterations between two checkpoints")
+    parser.add_argument('--resume', action='store_true', default=False,
+                         help="Resume the problem loop from --checkpoint " \
+                             "(same repo cookies and packages)")
+    parser.add_argument('--fixcache', action='store_true', default=False,
+                         help="Keep the problem fixes of a request in --cachedir " \
+                             "and apply them before the first solve of the next run")
+    parser.add_argument('--max-time', default=None, type=float, metavar='SECONDS',
+                         dest='max_time',
+                         help="Problem loop time budget. Once exhausted " \
+                             "the problematic jobs are weakened (SOLVER_WEAK) " \
+                             "and flagged as `weakened` in the data output")
+    parser.add_argument('--max-iterations', default=None, type=int, metavar='N',
+                         dest='max_iterations',
+                         help="Problem loop iterations budget (see --max-time), " \
+                             "shared by all the alignment rounds. " \
+                             "Without budget each round is limited to 3000 iterations")
+    parser.add_argument('--stream', action='store_true', default=False,
+                         help="Write data.json one package at a time " \
+                             "(temporary file renamed once complete)")
+    parser.add_argument('--format', default='json', choices=('json', 'sqlite'),
+                         help="Data output format. sqlite writes indexed " \
+                             "packages, provides, requires and advisories tables")
+    parser.add_argument('--diff-against', default=None, type=str, metavar='PATH',
+                         dest='diff_against',
+                         help="Previous data.json. Write the added, removed " \
+                             "and changed packages into data.diff.json")
+    parser.add_argument('--diff-only', action='store_true', default=False,
+                         dest='diff_only',
+                         help="Write data.diff.json instead of the full report")
+    parser.add_argument('--jobs', default=1, type=int,
+                         help="Number of repositories to download " \
+                             "and parse in parallel")
+    parser.add_argument('--serve', default=None, type=str, metavar='ADDRESS',
+                         help="Keep the pool loaded and serve solve requests " \
+                             "on `unix:/path/to/socket` or `host:port` (localhost only)")
+    parser.add_argument('--batch', default=None, type=str, metavar='FILE',
+                         help="JSONL file of solve requests " \
+                             "({\"id\": ..., \"packages\": [...], \"weak\": bool}) " \
+                             "solved against the same pool. " \
+                             "Results are written as JSONL records")
+    parser.add_argument('--partition', action='store_true', default=False,
+                         help="Split jobs into independent dependency components " \
+                             "solved separately and merged before the export")
+    parser.add_argument('--workers', default=1, type=int,
+                         help="Number of forked processes solving " \
+                             "--batch requests or --partition components " \
+                             "(0 means one per core)")
     parser.add_argument('-v', '--verbose', action='count', default=0)
     
     args = parser.parse_args()
+    if not args.packages and not args.serve and not args.batch:
+        parser.error('the following arguments are required: packages')
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if args.checkpoint and (args.serve or args.batch or args.partition):
+        parser.error('--checkpoint applies to a single problem loop ' \
+                '(not to --serve, --batch or --partition)')
+    if args.format != 'json' and (args.serve or args.batch):
+        parser.error('--format {} can not be used with ' \
+                '--serve or --batch'.format(args.format))
+    if args.diff_only and not args.diff_against:
+        parser.error('--diff-only requires --diff-against')
+    if args.diff_against and (args.serve or args.batch):
+        parser.error('--diff-against can not be used with --serve or --batch')
+    if args.fixcache and args.partition:
+        parser.error('--fixcache can not be used with --partition')
+    if args.checkpoint_every < 1:
+        parser.error('--checkpoint-every must be greater than 0')
+    if args.serve:
+        # fail before the (long) pool load
+        try:
+            solve_service.parse_address(args.serve)
+        except ValueError as e:
+            parser.error('--serve: {}'.format(e))
+
     level = logging.WARNING
     verbose = args.verbose
     if verbose == 1:
@@ -81,7 +458,10 @@ def main():
     logger.debug('Read argpase inputs')
     output =  os.path.abspath(args.output)
     if os.path.isdir(output):
-        output =  os.path.join(output, 'data.json')
+        if args.batch:
+            output =  os.path.join(output, 'data.jsonl')
+        else:
+            output =  os.path.join(output, 'data.' + args.format)
     
     export_dir =  os.path.dirname(output) 
     logger.debug('Check output file access: `{}` file'.format(output)) 
@@ -96,12 +476,14 @@ def main():
         logger.error('Unable to write data output file `{}` file'.format(output))
         exit(1)
    
+    cache = solv_cache(args.cachedir, args.cachesize)
+
     releasever = args.releasever
     if not releasever: 
         # read local rpm 
         # to retrieve system-release
         tmp = solv.Pool()
-        sysrepo = repo_system('@System', 'system')
+        sysrepo = repo_system('@System', 'system', cache=cache)
         sysrepo.load(tmp)
         tmp.createwhatprovides()
         release_sel = tmp.select('system-release', solv.Selection.SELECTION_PROVIDES)
@@ -109,56 +491,69 @@ def main():
             releasever = s.evr.split('-')[0]
             logger.debug('Read releasever {}'.format(releasever))
         tmp.free()
-    # problems_class = interactive
-    problems_class = MultiversionProblemSolver
-    data_writer = data_json
 
-    # action_solver = solv.Job.SOLVER_DISTUPGRADE
-    # action_solver = solv.Job.SOLVER_UPDATE
-    # use a fake install to force full rpm depedencies 
-    action_solver = solv.Job.SOLVER_INSTALL
+    workers = args.workers
+    if workers == 0:
+        workers = os.cpu_count()
+    # batch workers are daemon processes (no children)
+    # their components are solved in-process
+    partition_workers = 1 if args.batch else workers
 
-    # read all repo configs
-    repos = []
-    reposdir = args.repodir
+    trace = None
+    if args.trace:
+        trace = problem_trace(args.trace)
+    # created once the repos are loaded
+    checkpoint = None
+
+    writers = {'json': data_json, 'sqlite': data_sqlite}
+    diff = None
+    if args.diff_against:
+        diff = (args.diff_against, os.path.join(export_dir, 'data.diff.json'))
+
+    def solve(pool, repos, packages, weak=False, updateinfo=False, output=None):
+        return solve_packages(pool, repos, packages, output=output,
+                data_writer=writers[args.format], 
+                diff=diff, diff_only=args.diff_only,
+                weak=weak, updateinfo=updateinfo, verbose=verbose,
+                multifix=args.multifix, partition=args.partition, 
+                workers=partition_workers, trace=trace, checkpoint=checkpoint,
+                fixcache=cache if args.fixcache else None,
+                max_time=args.max_time, max_iterations=args.max_iterations)
+
+    if args.serve:
+        def load():
+            logger.info('Fetch repodata')
+            repos = read_repos(args, cache, releasever)
+            return load_pool(args, cache, repos), repos
+
+        service = solve_service(load, solve)
+        service.serve(args.serve)
+        return
 
-    basearch = args.basearch
-    
     logger.info('Fetch repodata')
-    for repo_file in sorted(glob.glob('%s/*.repo' % reposdir)):
-        config = configparser.ConfigParser()
-        config.read(repo_file)
-        for section in config.sections():
-            repoattr = {'enabled': 0, 'priority': 99, 'autorefresh': 1, 'type': 'rpm', 'metadata_expire': "900"}
-            repoattr.update(config[section])
-            if repoattr['type'] == 'rpm':
-                repo = repo_repomd(section, 'repomd', repoattr, 
-                                   basearch = args.basearch,
-                                   releasever = releasever)
-                repos.append(repo)
-    
-    pool = solv.Pool()
-    pool.setarch(args.basearch)
-    pool.set_loadcallback(load_stub)
+    repos = read_repos(args, cache, releasever)
 
-    # now load all enabled repos into the pool
-    for repo in repos:
-        if int(repo['enabled']):
-            repo.load(pool)
+    if args.batch:
+        pool = load_pool(args, cache, repos)
+        requests = read_requests(args.batch, 
+                weak=args.weak, updateinfo=args.reportupdateinfo)
+        if workers > 1:
+            # workers inherit the prepared pool
+            records = solve_batch_parallel(pool, repos, requests, solve, workers)
+        else:
+            records = solve_batch(pool, repos, requests, solve)
+        with open(output, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+                f.flush()
+        return
     
-    cmdlinerepo = None
+    rpms = []
     packages = []
     for arg in args.packages:
         if arg.endswith(".rpm") and os.access(arg, os.R_OK):
-            if not cmdlinerepo:
-                cmdlinerepo = repo_cmdline('@commandline', 'cmdline')
-                cmdlinerepo.load(pool)
-                cmdlinerepo['packages'] = {}
-            s = cmdlinerepo.handle.add_rpm(arg, solv.Repo.REPO_REUSE_REPODATA|solv.Repo.REPO_NO_INTERNALIZE)
-            if not s:
-                print(pool.errstr)
-                sys.exit(1)
-            cmdlinerepo['packages'][arg] = s
+            rpms.append(arg)
         elif os.access(arg, os.R_OK):
             # read a list of packages from file
             with open(arg, 'r') as f:
@@ -170,83 +565,23 @@ def main():
         else:
             packages.append(arg)
 
-    if cmdlinerepo:
-        cmdlinerepo.handle.internalize()
-
-    addedprovides = pool.addfileprovides_queue()
-    if addedprovides:
-        #sysrepo.updateaddedprovides(addedprovides)
-        for repo in repos:
-            repo.updateaddedprovides(addedprovides)
-
-    pool.createwhatprovides()
-    
-    # FIXME: workaroud to have less 
-    # confict to solve 
-    # this helps to keep as much packages
-    # as possible in the data.json
-    logger.debug('Remove SOLVABLE_CONFLICTS SOLVABLE_OBSOLETES from pool')
-    for s in pool.solvables:
-        s.unset(solv.SOLVABLE_CONFLICTS)
-        s.unset(solv.SOLVABLE_OBSOLETES)
-        #s.unset(solv.SOLVABLE_FILELIST)
+    pool = load_pool(args, cache, repos, rpms)
+    if args.checkpoint:
+        checkpoint = problem_checkpoint(args.checkpoint, repos,
+                every=args.checkpoint_every, resume=args.resume)
 
-    action_solver |= solv.Job.SOLVER_CLEANDEPS
-    # action_solver |= solv.Job.SOLVER_FORCEBEST
-    if args.weak:
-        action_solver |= solv.Job.SOLVER_WEAK
+    if args.stream or args.format != 'json' or args.diff_only:
+        # records are written one at a time
+        data = solve(pool, repos, packages, weak=args.weak, 
+                updateinfo=args.reportupdateinfo, output=output)
+        if data is None:
+            sys.exit(0)
+        return
 
-    logger.info('Build job stack')
-    # convert arguments into jobs
-    js = JobSolver(pool, repos, action_solver)
-    jobs = js.get_jobs_from_packages(packages) 
-    
-    if not jobs:
-        print("no package matched.")
-        sys.exit(1)
-
-    if verbose > 2:
-        pool.set_debuglevel(verbose-2)
-    
-    logger.info('Solv jobs')
-    problem_solver = problems_class(pool)
-    solver = problem_solver.run_problem_loop(jobs)
-
-    # no problems, show transaction
-    trans = solver.transaction()
-    del solver
-    if trans.isempty():
-        print("Nothing to do.")
+    data = solve(pool, repos, packages, weak=args.weak, 
+            updateinfo=args.reportupdateinfo)
+    if data is None:
         sys.exit(0)
-    
-    print('')
-    print("Transaction summary:")
-    print('')
-    for cl in trans.classify(solv.Transaction.SOLVER_TRANSACTION_SHOW_OBSOLETES | solv.Transaction.SOLVER_TRANSACTION_OBSOLETE_IS_UPGRADE):
-        if cl.type == solv.Transaction.SOLVER_TRANSACTION_ERASE:
-            print("%d erased packages:" % cl.count)
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_INSTALL:
-            print("%d installed packages:" % cl.count)
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_REINSTALLED:
-            print("%d reinstalled packages:" % cl.count)
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_DOWNGRADED:
-            print("%d downgraded packages:" % cl.count)
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_CHANGED:
-            print("%d changed packages:" % cl.count)
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_UPGRADED:
-            print("%d upgraded packages:" % cl.count)
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_VENDORCHANGE:
-            print("%d vendor changes from '%s' to '%s':" % (cl.count, cl.fromstr, cl.tostr))
-        elif cl.type == solv.Transaction.SOLVER_TRANSACTION_ARCHCHANGE:
-            print("%d arch changes from '%s' to '%s':" % (cl.count, cl.fromstr, cl.tostr))
-        else:
-            continue
-         
-        print("install size change: %d K" % trans.calc_installsizechange())
-        logger.info('Build data output')
-        dw = data_writer(pool)
-        updateinfo = args.reportupdateinfo
-        data = dw.format(cl.solvables(), updateinfo=updateinfo)
 
     with open(output, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+solv = pytest.importorskip('solv')
+if not hasattr(solv, 'Pool'):
+    # the ./solv directory shadows the missing bindings
+    pytest.skip('libsolv python bindings are not installed', allow_module_level=True)
+
+from rpm_solv import solve_packages
+
+def make_pool(seed):
+    """
+    random multilib pool
+    some requires are versioned and some can not be provided
+    """
+    rnd = random.Random(seed)
+    pool = solv.Pool()
+    pool.setarch('x86_64')
+    repo = pool.add_repo('random')
+    names = ['pkg{}'.format(i) for i in range(12)]
+    for name in names:
+        arches = rnd.choice((['x86_64'], ['noarch'], ['x86_64', 'i686']))
+        for version in range(1, rnd.randint(1, 3) + 1):
+            requires = rnd.sample(names, rnd.randint(0, 2))
+            for arch in arches:
+                s = repo.add_solvable()
+                s.name = name
+                s.evr = '{}-1'.format(version)
+                s.arch = arch
+                s.add_deparray(solv.SOLVABLE_PROVIDES,
+                        pool.Dep(name).Rel(solv.REL_EQ, pool.Dep(s.evr)))
+                for req in requires:
+                    if req == name:
+                        continue
+                    dep = pool.Dep(req)
+                    if rnd.random() < 0.3:
+                        dep = dep.Rel(solv.REL_GT | solv.REL_EQ, pool.Dep('2-1'))
+                    s.add_deparray(solv.SOLVABLE_REQUIRES, dep)
+    repo.internalize()
+    pool.createwhatprovides()
+    return pool
+
+@pytest.mark.parametrize('seed', range(1, 30))
+def test_partition_matches_default(seed):
+    nevras = []
+    for partition in (False, True):
+        pool = make_pool(seed)
+        data = solve_packages(pool, [], ['*'], partition=partition)
+        nevras.append(sorted(d['nevra'] for d in data or ()))
+        pool.free()
+    assert nevras[0] == nevras[1]
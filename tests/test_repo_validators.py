@@ -0,0 +1,102 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+solv = pytest.importorskip('solv')
+if not hasattr(solv, 'Pool'):
+    # the ./solv directory shadows the missing bindings
+    pytest.skip('libsolv python bindings are not installed', allow_module_level=True)
+
+from utils.cache import solv_cache
+from utils.repo import repo_repomd
+
+REPOMD = b'''<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <revision>1</revision>
+</repomd>
+'''
+ETAG = '"repomd-1"'
+LAST_MODIFIED = 'Sat, 17 Oct 2026 00:00:00 GMT'
+
+class repomd_handler(BaseHTTPRequestHandler):
+    """
+    repodata/repomd.xml stand-in
+    answers 304 (with Last-Modified) to a matching If-None-Match
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path != '/repodata/repomd.xml':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.send_header('Last-Modified', LAST_MODIFIED)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(REPOMD)))
+        self.end_headers()
+        self.wfile.write(REPOMD)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ('http_proxy', 'HTTP_PROXY', 'all_proxy', 'ALL_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), repomd_handler)
+    # keep-alive connections of the connection pool
+    # must not block the shutdown
+    httpd.daemon_threads = True
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+def load_repo(cache, url):
+    # metadata_expire 0: always revalidate repomd.xml
+    repo = repo_repomd('validators', 'repomd', {'baseurl': url, 'enabled': 1,
+        'priority': 99, 'autorefresh': 1, 'metadata_expire': '0'}, cache)
+    pool = solv.Pool()
+    loaded = repo.load(pool)
+    return repo, pool, loaded
+
+def test_not_modified_uses_cached_cookie(server, tmp_path):
+    cache = solv_cache(str(tmp_path))
+    url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+    repo, pool, loaded = load_repo(cache, url)
+    assert loaded
+    cookie = repo['cookie']
+    assert cookie
+    assert cache.readref('validators')[0] == cookie
+    with open(repo.validatorspath()) as f:
+        assert json.load(f) == {'etag': ETAG, 'last_modified': None}
+    pool.free()
+
+    repo, pool, loaded = load_repo(cache, url)
+    assert loaded
+    # conditional request answered by 304
+    path, headers = server.requests[-1]
+    assert path == '/repodata/repomd.xml'
+    assert headers.get('If-None-Match') == ETAG
+    assert len(server.requests) == 2
+    # the cached cookie is reused
+    assert repo['cookie'] == cookie
+    # and the validators of the 304 are written
+    with open(repo.validatorspath()) as f:
+        assert json.load(f) == {'etag': ETAG, 'last_modified': LAST_MODIFIED}
+    pool.free()
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+solv = pytest.importorskip('solv')
+if not hasattr(solv, 'Pool'):
+    # the ./solv directory shadows the missing bindings
+    pytest.skip('libsolv python bindings are not installed', allow_module_level=True)
+
+from utils.format import data_json, data_sqlite
+
+UPDATE = '''  <update from="test" status="final" type="security" version="1">
+    <id>{id}</id>
+    <title>{id}</title>
+    <issued date="{date}"/>
+    <severity>Important</severity>
+    <references/>
+    <pkglist>
+      <collection short="test">
+        <name>test</name>
+        <package name="bash" version="{version}" release="1" epoch="0" arch="x86_64" src="">
+          <filename>bash-{version}-1.x86_64.rpm</filename>
+        </package>
+      </collection>
+    </pkglist>
+  </update>
+'''
+UPDATEINFO = '<?xml version="1.0"?>\n<updates>\n{}{}</updates>\n'.format(
+        UPDATE.format(id='ADV-0', date='2020-01-01 00:00:00', version='4.4'),
+        UPDATE.format(id='ADV-1', date='2021-01-01 00:00:00', version='5.0'))
+
+@pytest.fixture
+def pool(tmp_path):
+    """
+    two repos (i.e. two .repo files with the same baseurl)
+    shipping the same bash and updateinfo
+    """
+    path = tmp_path / 'updateinfo.xml'
+    path.write_text(UPDATEINFO)
+    pool = solv.Pool()
+    pool.setarch('x86_64')
+    for name in ('repo-a', 'repo-b'):
+        repo = pool.add_repo(name)
+        s = repo.add_solvable()
+        s.name = 'bash'
+        s.evr = '5.0-1'
+        s.arch = 'x86_64'
+        s.add_deparray(solv.SOLVABLE_PROVIDES,
+                pool.Dep('bash').Rel(solv.REL_EQ, pool.Dep(s.evr)))
+        f = solv.xfopen(str(path))
+        repo.add_updateinfoxml(f, 0)
+        f.close()
+        repo.internalize()
+    pool.createwhatprovides()
+    yield pool
+    pool.free()
+
+def bash(pool):
+    return [s for s in pool.solvables_iter() if s.name == 'bash'][:1]
+
+def test_shared_updateinfo_attached_once(pool):
+    data = data_json(pool).format(bash(pool), updateinfo=True)
+    names = [info['name'] for info in data[0]['updateinfos']]
+    assert len(names) == 2
+    assert len(set(names)) == 2
+    # sorted by buildtime
+    assert names[0].endswith('ADV-1')
+
+def test_shared_updateinfo_sqlite_rows(pool):
+    db = sqlite3.connect(':memory:')
+    data_sqlite(pool).load(db, bash(pool), updateinfo=True)
+    assert db.execute('SELECT COUNT(*) FROM advisories').fetchone()[0] == 2
+    assert db.execute('SELECT COUNT(*) FROM package_advisories').fetchone()[0] == 2
+    db.close()
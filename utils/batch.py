@@ -0,0 +1,92 @@
+import json
+import multiprocessing
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def read_requests(path, weak=False, updateinfo=False):
+    """
+    Read a JSONL file of solve requests
+      {"id": "profile-1", "packages": ["bash", "curl"], "weak": true}
+    yield request dicts with default values
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                req = json.loads(line)
+            except ValueError as e:
+                req = {'error': 'invalid json: {}'.format(e)}
+            if not isinstance(req, dict):
+                req = {'error': 'invalid request'}
+            req.setdefault('id', lineno)
+            req.setdefault('weak', weak)
+            req.setdefault('reportupdateinfo', updateinfo)
+            yield req
+
+def solve_request(pool, repos, req, solve):
+    """
+    Run one request against the loaded pool
+    solve(pool, repos, packages, weak, updateinfo) returns data_json report
+    return the output record
+    """
+    record = {'id': req['id']}
+    if 'error' in req:
+        record['error'] = req['error']
+        return record
+    packages = req.get('packages', None)
+    if not packages or not isinstance(packages, list) \
+            or not all(isinstance(p, str) for p in packages):
+        record['error'] = '`packages` must be a list of strings'
+        return record
+    logger.info('Solve request `{}`'.format(req['id']))
+    try:
+        data = solve(pool, repos, packages,
+                weak=bool(req['weak']), updateinfo=bool(req['reportupdateinfo']))
+    except SystemExit:
+        # the job solver exits on invalid queries
+        record['error'] = 'invalid packages query'
+        return record
+    except AssertionError as e:
+        record['error'] = str(e)
+        return record
+    if data is None:
+        data = []
+    record['packages'] = data
+    return record
+
+def solve_batch(pool, repos, requests, solve):
+    """
+    yield one output record per request
+    pool changes made by the problem loop
+    are reverted between requests by solve()
+    """
+    for req in requests:
+        yield solve_request(pool, repos, req, solve)
+
+# (pool, repos, solve) inherited by forked workers
+_worker_state = None
+
+def _solve_worker(req):
+    pool, repos, solve = _worker_state
+    return solve_request(pool, repos, req, solve)
+
+def solve_batch_parallel(pool, repos, requests, solve, workers):
+    """
+    Fork workers sharing the prepared pool copy-on-write
+    only requests and output records go through pipes
+    records are yielded as soon as they are solved
+    (not in requests order)
+    """
+    global _worker_state
+    _worker_state = (pool, repos, solve)
+    try:
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(workers) as workers_pool:
+            for record in workers_pool.imap_unordered(_solve_worker, requests):
+                yield record
+    finally:
+        _worker_state = None
@@ -0,0 +1,249 @@
+import solv
+import os
+import re
+import json
+import struct
+import hashlib
+import tempfile
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class solv_cache(object):
+    """
+    Content addressed solv cache
+
+    solv files are keyed by the repo cookie (repomd checksum)
+    so identical metadata is shared across repo names, arches
+    and containers
+      objects/<cookie>.solv
+      objects/<extcookie>_<ext>.solvx
+    refs/<repo name> holds the cookie of the latest repo refresh
+    its mtime is used to compute the metadata expiration
+    """
+
+    def __init__(self, path='/var/cache/solv', max_size=0):
+        self.path = path
+        # max objects size in bytes (0 means unlimited)
+        self.max_size = max_size
+
+    def mkdirs(self):
+        for d in ('objects', 'refs'):
+            os.makedirs(os.path.join(self.path, d), 0o755, exist_ok=True)
+
+    def objpath(self, cookie, ext=None):
+        path = cookie.hex()
+        if ext:
+            path += "_" + ext + ".solvx"
+        else:
+            path += ".solv"
+        return os.path.join(self.path, 'objects', path)
+
+    def refpath(self, name, suffix=''):
+        path = re.sub(r'^\.', '_', name)
+        return os.path.join(self.path, 'refs', re.sub(r'[/]', '_', path) + suffix)
+
+    def readref(self, name):
+        """
+        return the cookie and the refresh time of a repo
+        """
+        try:
+            refpath = self.refpath(name)
+            with open(refpath, 'r') as f:
+                cookie = bytes.fromhex(f.read().strip())
+            if len(cookie) != 32:
+                return None, None
+            return cookie, os.stat(refpath).st_mtime
+        except (OSError, IOError, ValueError):
+            return None, None
+
+    def writeref(self, name, cookie):
+        self.write(self.refpath(name), cookie.hex())
+
+    def write(self, path, data):
+        """
+        atomic text file write
+        """
+        tmpname = None
+        try:
+            self.mkdirs()
+            (fd, tmpname) = tempfile.mkstemp(prefix='.new-', dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.rename(tmpname, path)
+        except (OSError, IOError):
+            if tmpname:
+                os.unlink(tmpname)
+
+    def mkstemp(self, prefix='.newsolv-'):
+        self.mkdirs()
+        return tempfile.mkstemp(prefix=prefix, dir=os.path.join(self.path, 'objects'))
+
+    def touch(self, path):
+        # no futimes in python?
+        try:
+            os.utime(path, None)
+        except Exception:
+            pass
+
+    def evict(self):
+        """
+        Remove the least recently used objects
+        until the cache size fits in max_size
+        """
+        if not self.max_size:
+            return
+        objects = []
+        total = 0
+        objdir = os.path.join(self.path, 'objects')
+        try:
+            for entry in os.scandir(objdir):
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                st = entry.stat()
+                objects.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        except OSError:
+            return
+        objects.sort()
+        for mtime, size, path in objects:
+            if total <= self.max_size:
+                break
+            logger.info('Evict `{}` from solv cache'.format(path))
+            try:
+                # loaded repos keep their opened file
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+def cache_size(string):
+    """
+    Convert a size string (10G, 500M, 1024k ...) into bytes
+    """
+    units = {'k': 1024, 'm': 1024**2, 'g': 1024**3, 't': 1024**4}
+    string = string.strip().lower().rstrip('b')
+    if string and string[-1] in units:
+        return int(float(string[:-1]) * units[string[-1]])
+    return int(string)
+
+class pool_snapshot(object):
+    """
+    Single file snapshot of a prepared pool
+    (repos loaded, file provides added, 
+    conflicts and obsoletes removed)
+    keyed by the repo cookies and basearch
+
+    layout: solv data of each repo, json index, 
+    index offset and magic
+    """
+    magic = b'RPMSOLVSNAP1'
+
+    def __init__(self, cache, basearch):
+        self.cache = cache
+        self.basearch = basearch
+
+    def key(self, repos):
+        """
+        return None if a repo metadata expired
+        """
+        chksum = hashlib.sha256()
+        chksum.update(self.magic)
+        chksum.update(self.basearch.encode())
+        for repo in repos:
+            cookie = repo.cachedcookie()
+            if not cookie:
+                return None
+            chksum.update(repo.name.encode() + b'\0')
+            chksum.update(cookie)
+        return chksum.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache.path, 'objects', key + '.snapshot')
+
+    def load(self, pool, repos, key):
+        """
+        fill pool from the snapshot
+        the caller only has to create whatprovides
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                trailer_size = 8 + len(self.magic)
+                f.seek(-trailer_size, os.SEEK_END)
+                trailer = f.read(trailer_size)
+                if len(trailer) != trailer_size or not trailer.endswith(self.magic):
+                    return False
+                offset, = struct.unpack('>Q', trailer[:8])
+                f.seek(offset)
+                index = json.loads(f.read(os.fstat(f.fileno()).st_size - offset - trailer_size))
+                names = {repo.name: repo for repo in repos}
+                if [e['name'] for e in index] != [repo.name for repo in repos]:
+                    return False
+                for e in index:
+                    repo = names[e['name']]
+                    repo.handle = pool.add_repo(repo.name)
+                    repo.handle.appdata = repo
+                    repo.handle.priority = 99 - repo['priority']
+                    repo['cookie'] = bytes.fromhex(e['cookie'])
+                    repo['extcookie'] = bytes.fromhex(e['extcookie'])
+                    # bypass python buffering, 
+                    # the xfile shares the fd offset
+                    os.lseek(f.fileno(), e['offset'], os.SEEK_SET)
+                    xf = solv.xfopen_fd('', f.fileno())
+                    # stubs are recreated to load 
+                    # filelists on demand
+                    if not repo.handle.add_solv(xf, 0):
+                        logger.warning('Invalid snapshot `{}`'.format(path))
+                        self.__discard(repos)
+                        return False
+                    xf.close()
+        except (OSError, IOError, ValueError, KeyError):
+            self.__discard(repos)
+            return False
+        self.cache.touch(path)
+        logger.info('Pool loaded from snapshot `{}`'.format(path))
+        return True
+
+    def __discard(self, repos):
+        for repo in repos:
+            if hasattr(repo, 'handle'):
+                repo.handle.free(True)
+                del repo.handle
+
+    def write(self, pool, repos, key):
+        tmpname = None
+        try:
+            (fd, tmpname) = self.cache.mkstemp(prefix='.newsnapshot-')
+            os.fchmod(fd, 0o444)
+            with os.fdopen(fd, 'wb') as f:
+                index = []
+                for repo in repos:
+                    if not hasattr(repo, 'handle'):
+                        return
+                    index.append({
+                        'name': repo.name,
+                        'cookie': repo['cookie'].hex(),
+                        'extcookie': (repo['extcookie'] or b'').hex(),
+                        'offset': os.lseek(fd, 0, os.SEEK_CUR),
+                    })
+                    # the xfile shares the fd offset
+                    xf = solv.xfopen_fd(None, fd)
+                    repo.handle.write_first_repodata(xf)
+                    xf.flush()
+                    xf.close()
+                    os.lseek(fd, 0, os.SEEK_END)
+                offset = os.lseek(fd, 0, os.SEEK_CUR)
+                f.write(json.dumps(index).encode())
+                f.write(struct.pack('>Q', offset))
+                f.write(self.magic)
+            os.rename(tmpname, self.path(key))
+            tmpname = None
+            logger.info('Pool snapshot written to `{}`'.format(self.path(key)))
+            self.cache.evict()
+        except (OSError, IOError):
+            pass
+        finally:
+            if tmpname and os.path.exists(tmpname):
+                os.unlink(tmpname)
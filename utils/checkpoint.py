@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class problem_checkpoint(object):
+    """
+    Save the problem loop state every N iterations
+    so a long run can be resumed after a crash
+
+    the state is only valid for the same repo cookies
+    (same solvable ids) and the same request jobs,
+    it holds the outer round (i.e. multiversion alignment)
+    and the job stack of this round
+    """
+    version = 2
+
+    def __init__(self, path, repos, every=100, resume=False):
+        self.path = path
+        self.every = every
+        # load the checkpoint on the next loop start
+        self.resume = resume
+        chksum = hashlib.sha256()
+        for repo in repos:
+            if not hasattr(repo, 'handle'):
+                continue
+            chksum.update(repo.name.encode() + b'\0')
+            chksum.update(repo['cookie'] or b'')
+        self.repos_key = chksum.hexdigest()
+
+    def key(self, jobs):
+        """
+        checkpoint key of the request jobs
+        """
+        chksum = hashlib.sha256()
+        chksum.update(self.repos_key.encode())
+        for job in jobs:
+            chksum.update('{:x}:{:x},'.format(job.how, job.what).encode())
+        return chksum.hexdigest()
+
+    def load(self, key):
+        """
+        return the saved state or None
+        """
+        self.resume = False
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, IOError, ValueError):
+            logger.warning('No checkpoint to resume from `{}`'.format(self.path))
+            return None
+        if state.get('version') != self.version or state.get('key') != key:
+            logger.warning('Checkpoint `{}` does not match ' \
+                    'the repos or the jobs, ignore it'.format(self.path))
+            return None
+        logger.warning('Resume problem loop from `{}` round `{}` ' \
+                'iteration `{}`'.format(self.path, state['round'], state['loop_count']))
+        return state
+
+    def write(self, key, state):
+        """
+        atomic checkpoint write
+        """
+        state['version'] = self.version
+        state['key'] = key
+        tmpname = None
+        try:
+            (fd, tmpname) = tempfile.mkstemp(prefix='.checkpoint-',
+                    dir=os.path.dirname(os.path.abspath(self.path)))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f)
+            os.rename(tmpname, self.path)
+            tmpname = None
+            logger.info('Checkpoint written at round `{}` ' \
+                    'iteration `{}`'.format(state['round'], state['loop_count']))
+        except (OSError, IOError):
+            logger.exception('Unable to write checkpoint `{}`'.format(self.path))
+        finally:
+            if tmpname and os.path.exists(tmpname):
+                os.unlink(tmpname)
@@ -0,0 +1,143 @@
+import os
+import http.client
+import threading
+import contextlib
+
+from urllib import request, parse, error
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class connection_pool(object):
+    """
+    Per host keep-alive HTTP(S) connections
+    shared by all repositories
+    """
+    max_redirects = 5
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def reset(self):
+        """
+        forget the idle connections inherited 
+        from the parent process (forked child)
+        the sockets are still used by the parent
+        """
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def __new_connection(self, scheme, netloc):
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def __get_connection(self, scheme, netloc):
+        """
+        return an idle connection and a `reused` flag
+        """
+        with self.lock:
+            conns = self.idle.get((scheme, netloc), None)
+            if conns:
+                return conns.pop(), True
+        return self.__new_connection(scheme, netloc), False
+
+    def __release_connection(self, scheme, netloc, conn, response):
+        """
+        keep the connection alive only if the response
+        has been fully read
+        """
+        if response.will_close or not response.isclosed():
+            conn.close()
+            return
+        with self.lock:
+            self.idle.setdefault((scheme, netloc), []).append(conn)
+
+    def __use_urllib(self, parts):
+        """
+        let urllib handle non http urls (file://, ftp://...)
+        and proxies
+        """
+        if parts.scheme not in ('http', 'https'):
+            return True
+        proxies = request.getproxies()
+        if parts.scheme in proxies and not request.proxy_bypass(parts.hostname or ''):
+            return True
+        return False
+
+    def __request(self, parts, headers):
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn, reused = self.__get_connection(parts.scheme, parts.netloc)
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # the server closed the idle connection
+            # retry once with a fresh one
+            logger.debug('Retry `{}` with a new connection'.format(parts.geturl()))
+            conn = self.__new_connection(parts.scheme, parts.netloc)
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+        return conn, response
+
+    @contextlib.contextmanager
+    def urlopen(self, url, headers=None):
+        """
+        yield a response for url
+        follow redirects and raise urllib.error.HTTPError
+        on http errors (304 Not Modified is returned as is)
+        """
+        if headers is None:
+            headers = {}
+        parts = parse.urlsplit(url)
+        if self.__use_urllib(parts):
+            req = request.Request(url, headers=headers)
+            try:
+                response = request.urlopen(req)
+            except error.HTTPError as e:
+                if e.code != 304:
+                    raise
+                response = e
+            with response:
+                yield response
+            return
+
+        for i in range(self.max_redirects + 1):
+            conn, response = self.__request(parts, headers)
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader('Location')
+                response.read()
+                self.__release_connection(parts.scheme, parts.netloc, conn, response)
+                url = parse.urljoin(url, location)
+                logger.debug('Redirect to `{}`'.format(url))
+                parts = parse.urlsplit(url)
+                if self.__use_urllib(parts):
+                    with self.urlopen(url, headers) as response:
+                        yield response
+                    return
+                continue
+            break
+        else:
+            conn.close()
+            raise error.HTTPError(url, response.status, 'Too many redirects', response.headers, None)
+
+        try:
+            if response.status >= 400:
+                raise error.HTTPError(url, response.status, response.reason, response.headers, None)
+            yield response
+        finally:
+            self.__release_connection(parts.scheme, parts.netloc, conn, response)
+
+# shared by all repositories
+pool = connection_pool()
+# forked workers (i.e: repos prefetch) must not 
+# share the keep-alive sockets of their parent
+os.register_at_fork(after_in_child=pool.reset)
@@ -0,0 +1,91 @@
+import solv
+from bisect import bisect_right
+from functools import cmp_to_key
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class evr_ladder(object):
+    """
+    Index of the pool solvables per (name id, arch id)
+    sorted by evr
+
+    each solvable gets an integer rank within its name.arch
+    (solvables with the same evr share the same rank)
+    so comparisons and next version lookups
+    do not call evrcmp nor pool.select
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        # (nameid, archid) -> ([solvables], [ranks])
+        self.ladders = {}
+        # solvable id -> rank
+        self.ranks = {}
+        self.build()
+
+    @classmethod
+    def get(cls, pool):
+        """
+        return the ladder attached to the pool
+        (built on first use)
+        """
+        indexes = pool.appdata
+        if not isinstance(indexes, dict):
+            # per pool indexes
+            indexes = {}
+            pool.appdata = indexes
+        ladder = indexes.get(cls.__name__, None)
+        if ladder is None:
+            ladder = cls(pool)
+            indexes[cls.__name__] = ladder
+        return ladder
+
+    def build(self):
+        groups = {}
+        for s in self.pool.solvables_iter():
+            groups.setdefault((s.nameid, s.archid), []).append(s)
+        evrcmp = cmp_to_key(lambda s, o: s.evrcmp(o))
+        for key, solvables in groups.items():
+            # stable sort keeps solvable id order
+            # within the same evr
+            solvables.sort(key=evrcmp)
+            ranks = []
+            rank = 0
+            prev = None
+            for s in solvables:
+                if prev is not None and s.evrid != prev.evrid \
+                        and s.evrcmp(prev) != 0:
+                    rank += 1
+                ranks.append(rank)
+                self.ranks[s.id] = rank
+                prev = s
+            self.ladders[key] = (solvables, ranks)
+        logger.debug('EVR ladder built for `{}` name.arch'.format(len(self.ladders)))
+
+    def rank(self, solvable):
+        return self.ranks[solvable.id]
+
+    def cmp(self, solvable, other):
+        """
+        evrcmp compatible comparison
+        return 1 if solvable > other, -1 if solvable < other, 0 otherwise
+        """
+        if solvable.nameid != other.nameid or solvable.archid != other.archid:
+            return solvable.evrcmp(other)
+        rank = self.ranks[solvable.id]
+        other_rank = self.ranks[other.id]
+        return (rank > other_rank) - (rank < other_rank)
+
+    def next(self, solvable):
+        """
+        return the first solvable of the next evr
+        of the same name.arch
+        None if solvable is the latest one
+        """
+        solvables, ranks = self.ladders[(solvable.nameid, solvable.archid)]
+        idx = bisect_right(ranks, self.ranks[solvable.id])
+        if idx < len(solvables):
+            return solvables[idx]
+        return None
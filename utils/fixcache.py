@@ -0,0 +1,67 @@
+import json
+import hashlib
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class fix_cache(object):
+    """
+    Problem fixes learned by the previous runs of a request
+
+    a problem signature `rule type|solvable nevra|dep or other nevra`
+    maps to the list of fixes which resolved it
+      {"op": "remove_solvable", "solvables": [nevra], "preserve": 0}
+      {"op": "remove_dep", "solvables": [nevra], "dep": "foo >= 1.0"}
+      {"op": "unset_conflicts", "solvables": [nevra]}
+      {"op": "multiversion", "solvables": [nevra]}
+      {"op": "replace", "solvables": [nevra, next nevra]}
+
+    the file is kept in the solv cache refs,
+    keyed by the request packages
+    """
+
+    def __init__(self, cache, packages, weak=False):
+        self.cache = cache
+        key = hashlib.sha256(json.dumps([list(packages), bool(weak)]).encode()).hexdigest()
+        self.path = cache.refpath('fixes-' + key, '.json')
+        # fixes read from the cache
+        self.fixes = self.read()
+        # fixes still valid for the current pool
+        self.applied = {}
+        # fixes found by the current run
+        self.learned = {}
+
+    @staticmethod
+    def signature(rule_name, solvable, detail=''):
+        return '{}|{}|{}'.format(rule_name, solvable, detail)
+
+    def read(self):
+        try:
+            with open(self.path, 'r') as f:
+                fixes = json.load(f)
+        except (OSError, IOError, ValueError):
+            return {}
+        if not isinstance(fixes, dict):
+            return {}
+        logger.info('Read `{}` learned fixes from `{}`'.format(len(fixes), self.path))
+        return fixes
+
+    def learn(self, signature, fix):
+        fixes = self.learned.setdefault(signature, [])
+        if fix not in fixes:
+            fixes.append(fix)
+
+    def save(self):
+        """
+        keep the fixes still valid and the new ones
+        (stale fixes are dropped)
+        """
+        fixes = dict(self.applied)
+        for signature, learned in self.learned.items():
+            fixes.setdefault(signature, [])
+            for fix in learned:
+                if fix not in fixes[signature]:
+                    fixes[signature].append(fix)
+        self.cache.write(self.path, json.dumps(fixes, ensure_ascii=False))
+        logger.info('Write `{}` learned fixes to `{}`'.format(len(fixes), self.path))
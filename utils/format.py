@@ -1,29 +1,130 @@
 
 import solv
 
+import os
 import re
+import json
+import sqlite3
+import tempfile
 from collections import OrderedDict
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+class advisory_index(object):
+    """
+    Reverse index of the pool advisories
+    (name id, arch id) -> [(name >= version-release dep id, 
+        advisory solvable id, collection filename)]
+
+    built in one pass over UPDATE_COLLECTION_FILENAME
+    solvable ids are only valid in one pool, the index is kept 
+    with the pool (the pool is reloaded when a repo cookie changes)
+    """
+    split_filename_re = re.compile( \
+            '(?P<name>.*)-(?P<version>[^-]+)-(?P<release>[^-]+)\.(?P<arch>\w+).rpm$' \
+    )
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.index = {}
+        self.build()
+
+    @classmethod
+    def get(cls, pool):
+        """
+        return the index attached to the pool
+        (built on first use)
+        """
+        indexes = pool.appdata
+        if not isinstance(indexes, dict):
+            # per pool indexes
+            indexes = {}
+            pool.appdata = indexes
+        index = indexes.get(cls.__name__, None)
+        if index is None:
+            index = cls(pool)
+            indexes[cls.__name__] = index
+        return index
+
+    def build(self):
+        logger.info("Build advisories index")
+        # iterate over all advisory is faster than
+        # searching for each errata's solv.UPDATE_COLLECTION_FILENAME
+        # one by one
+        uc_pack = self.pool.Dataiterator(solv.UPDATE_COLLECTION_FILENAME, '*', solv.Dataiterator.SEARCH_GLOB)
+        uc_pack.prepend_keyname(solv.UPDATE_COLLECTION)
+        count = 0
+        for p in uc_pack:
+            pos = p.parentpos()
+            str_col_filename = pos.lookup_str(solv.UPDATE_COLLECTION_FILENAME)
+            nevra_m = self.split_filename_re.match(str_col_filename)
+            if nevra_m is None:
+                logger.warning('Failed to match UPDATE_COLLECTION_FILENAME: `{}`'.format(str_col_filename))
+                continue
+            nevra_d = nevra_m.groupdict()
+            nameid = self.pool.str2id(nevra_d['name'], False)
+            archid = self.pool.str2id(nevra_d['arch'], False)
+            if not nameid or not archid:
+                # no package with this name in the pool
+                continue
+            evrid = self.pool.str2id('{version}-{release}'.format(**nevra_d))
+            depid = self.pool.rel2id(nameid, evrid, solv.REL_GT|solv.REL_EQ)
+            self.index.setdefault((nameid, archid), []).append(
+                    (depid, p.solvable.id, str_col_filename))
+            count += 1
+        logger.debug("Advisories index: `{}` entries".format(count))
+
+    def lookup(self, solvable):
+        """
+        yield (advisory solvable, collection filename)
+        of the advisories whose collection package is <= solvable
+        """
+        for depid, advisory_id, str_col_filename in self.index.get((solvable.nameid, solvable.archid), ()):
+            # name.arch >= version-release
+            if solvable.matchesdep(solv.SOLVABLE_PROVIDES, depid):
+                yield self.pool.solvables[advisory_id], str_col_filename
+
 class data_json(object):
 
     def __init__(self, pool):
         self.pool = pool
+        # interned advisory records
+        # (advisory solvable id, collection filename) -> record
+        self.advisories = {}
+        # advisory solvable id -> references
+        self.references = {}
+        # pool id -> string
+        self.strings = {}
+        # dependency ids tuple -> sorted strings
+        self.arrays = {}
+        # evr id -> (epoch, version, release)
+        self.evrs = {}
     
     def get_array(self, solvable, keyname):
         """
         Retrun a list of string based on solvable's keyname 
         """
-        ret = []
-        ids = solvable.lookup_idarray(keyname)
-        for i in ids:
-            ret.append(self.pool.id2str(i))
-        # sort all array to keep consistent
-        # list in data reports
-        return sorted(ret)
+        ids = tuple(solvable.lookup_idarray(keyname))
+        ret = self.arrays.get(ids, None)
+        if ret is None:
+            # sort all array to keep consistent
+            # list in data reports
+            ret = sorted(self.id2str(i) for i in ids)
+            self.arrays[ids] = ret
+        return ret
+
+    def id2str(self, i):
+        """
+        memoized pool.id2str
+        most dependencies are shared by many packages
+        """
+        ret = self.strings.get(i, None)
+        if ret is None:
+            ret = self.pool.id2str(i)
+            self.strings[i] = ret
+        return ret
 
     def get_references(self, solvable, references):
         """
@@ -60,8 +161,13 @@ class data_json(object):
         # the reboot field is no filled by vendors 
         # keep it for info
         str_reboot = solvable.lookup_str(solv.UPDATE_REBOOT)
-        references = []
-        self.get_references(solvable, references)
+        references = self.references.get(solvable.id, None)
+        if references is None:
+            # one Dataiterator walk per advisory
+            references = []
+            self.get_references(solvable, references)
+            references = sorted(references, key=lambda k: k['reference_id'], reverse=True)
+            self.references[solvable.id] = references
         return OrderedDict((
             ("name", str_name),
             ("patchcategory", str_patchcategory),
@@ -69,132 +175,174 @@ class data_json(object):
             ("buildtime", num_buildtime),
             ("reboot", str_reboot),
             ("collection_filename", str_col_filename),
-            ("references", sorted(references, key=lambda k: k['reference_id'], reverse=True)), 
+            ("references", references), 
         ))
     
-    def build_updateinfo_stack(self, data, sel):
+    def get_updateinfos(self, solvable, index):
+        """
+        return the sorted advisory records of a solvable
+        """
+        keys = set()
+        updateinfos = []
+        for advisory, str_col_filename in index.lookup(solvable):
+            # repos sharing the same updateinfo have one 
+            # advisory solvable each, attach it once
+            content_key = (advisory.nameid, advisory.evrid, str_col_filename)
+            if content_key in keys:
+                continue
+            keys.add(content_key)
+            key = (advisory.id, str_col_filename)
+            info = self.advisories.get(key, None)
+            if info is None:
+                # records are shared by all the packages
+                # of an advisory
+                info = self.get_updateinfo(advisory, str_col_filename)
+                self.advisories[key] = info
+            updateinfos.append(info)
+        return sorted(updateinfos, key=lambda k: k['buildtime'], reverse=True)
+
+    def build_updateinfo_stack(self, data, solvables):
         """
-        Parse UPDATE_COLLECTION_FILENAME 
-        and compare it to available selection
+        Lookup the advisories index
         to retrieve packages' update infos
         """
         logger.info("Retrieve updateinfo for packages")
-        split_filname_re = re.compile( \
-                '(?P<name>.*)-(?P<version>[^-]+)-(?P<release>[^-]+)\.(?P<arch>\w+).rpm$' \
-        )
-        flags = solv.Selection.SELECTION_NAME | solv.Selection.SELECTION_DOTARCH | solv.Selection.SELECTION_REL
-        # iterate over all advisory is faster than
-        # searching for each errata's solv.UPDATE_COLLECTION_FILENAME
-        # one by one
-        uc_pack = self.pool.Dataiterator(solv.UPDATE_COLLECTION_FILENAME, '*', solv.Dataiterator.SEARCH_GLOB)
-        uc_pack.prepend_keyname(solv.UPDATE_COLLECTION)
-        for p in uc_pack:
-            pos = p.parentpos()
-            #str_col_evr = pos.lookup_str(solv.UPDATE_COLLECTION_EVR)
-            str_col_name = pos.lookup_str(solv.UPDATE_COLLECTION_NAME)
-            str_col_arch = pos.lookup_str(solv.UPDATE_COLLECTION_ARCH)
-            str_col_filename = pos.lookup_str(solv.UPDATE_COLLECTION_FILENAME)
-            
-            nevra_m = split_filname_re.match(str_col_filename)
-            if nevra_m is not None:
-                nevra_d = nevra_m.groupdict()
-                query = '{name}.{arch} >= {version}-{release}'.format(**nevra_d) 
-                new_sel = self.pool.select(query, flags)
-                new_sel.filter(sel)
-                info = self.get_updateinfo(p.solvable, str_col_filename)
-                for s in new_sel.solvables():
-                    str_name = s.lookup_str(solv.SOLVABLE_NAME)
-                    str_arch = s.lookup_str(solv.SOLVABLE_ARCH)
-                    str_evr = s.lookup_str(solv.SOLVABLE_EVR)
-                    nevra = "{}-{}.{}".format(str_name, str_evr, str_arch)
-                    d = data.get(nevra, None)
-                    if d:
-                        # update or insert errata in packages list
-                        updateinfos = d.get('updateinfos', [])
-                        if info not in updateinfos:
-                            updateinfos.append(info)
-                        d["updateinfos"] = sorted(updateinfos, key=lambda k: k['buildtime'], reverse=True)
-                    else:
-                        continue
-            else:
-                logger.warning('Failed to match UPDATE_COLLECTION_FILENAME: `{}`'.format(str_col_filename))
+        index = advisory_index.get(self.pool)
+        for s in solvables:
+            d = data.get(self.get_nevra(s), None)
+            if not d:
                 continue
+            updateinfos = self.get_updateinfos(s, index)
+            if updateinfos:
+                # update or insert errata in packages list
+                d["updateinfos"] = updateinfos
 
-    def format(self, solvables, updateinfo=True):
-        evr_re = re.compile('^(?:(?P<epoch>\d+):)?(?P<version>.*?)(?:\.(?P<release>\w+))?$')
-        # create an empty selection to read 
+    def get_nevra(self, solvable):
+        str_name = self.id2str(solvable.nameid)
+        str_arch = self.id2str(solvable.archid)
+        str_evr = self.id2str(solvable.evrid)
+        return "{}-{}.{}".format(str_name, str_evr, str_arch)
+
+    def add_dropped(self, solvables, weakened):
+        """
+        return the solvables extended with the solvables
+        of the weakened jobs the solver dropped
+        and the nevra of the dropped ones
+        """
+        solvables = list(solvables)
+        missing = set(weakened).difference(self.get_nevra(s) for s in solvables)
+        dropped = {}
+        if missing:
+            for s in self.pool.solvables_iter():
+                nevra = self.get_nevra(s)
+                if nevra in missing and nevra not in dropped:
+                    dropped[nevra] = s
+        return solvables + list(dropped.values()), set(dropped)
+
+    def split_evr(self, evrid):
+        """
+        return (epoch, version, release) of an evr id
+        """
+        ret = self.evrs.get(evrid, None)
+        if ret is not None:
+            return ret
+        # 1:3.0.12-17.el7
+        ma = self.evr_re.match(self.id2str(evrid))
+        if ma is not None:
+            md = ma.groupdict()
+            e = md['epoch']
+            if not e:
+                epoch = '0'
+            else :
+                epoch = e
+            version = ma['version']
+            release = ma['release']
+        ret = (epoch, version, release)
+        self.evrs[evrid] = ret
+        return ret
+
+    evr_re = re.compile('^(?:(?P<epoch>\d+):)?(?P<version>.*?)(?:\.(?P<release>\w+))?$')
+
+    def format_solvable(self, s):
+        """
+        return the package record of a solvable
+        """
+        str_name = self.id2str(s.nameid)
+        str_arch = self.id2str(s.archid)
+        str_evr = self.id2str(s.evrid)
+        num_buildtime = s.lookup_num(solv.SOLVABLE_BUILDTIME)
+        str_vendor = self.id2str(s.vendorid) if s.vendorid else None
+        str_summary = s.lookup_str(solv.SOLVABLE_SUMMARY)
+        str_description = s.lookup_str(solv.SOLVABLE_DESCRIPTION)
+        provides = self.get_array(s, solv.SOLVABLE_PROVIDES)
+        requires = self.get_array(s, solv.SOLVABLE_REQUIRES)
+        # do not display filelist, obsolete & conflict
+        # since those attributes are removed from pool 
+        # to avoid problem solving
+        #filelist = self.get_array(s, solv.SOLVABLE_FILELIST)
+
+        nevra = "{}-{}.{}".format(str_name, str_evr, str_arch)
+        epoch, version, release = self.split_evr(s.evrid)
+        if release:
+            frmt_str = '{epoch}:{name}-{version}.{release}.{arch}'
+        else:
+            frmt_str = '{epoch}:{name}-{version}.{arch}'
+        df = {
+            'name': str_name,
+            'epoch': epoch,
+            'release': release,
+            'version': version,
+            'arch': str_arch,
+        }
+        envra = frmt_str.format(**df)
+
+        return OrderedDict((
+            ('nevra', nevra),
+            ('summary', str_summary),
+            ('description', str_description),
+            ('sourcepkg', s.lookup_sourcepkg()),
+            ('buildtime', num_buildtime),
+            ('vendor', str_vendor),
+            ('name', str_name),
+            ('epoch', epoch),
+            ('release', release),
+            ('version', version),
+            ('arch', str_arch),
+            ('evr', str_evr),
+            ('envra', envra),
+            ('repo', str(s.repo)),
+            ('provides', provides),
+            ('requires', requires),
+        ))
+
+    def format(self, solvables, updateinfo=True, weakened=()):
+        """
+        return the sorted package records
+        weakened: nevra of the solvables of weakened jobs
+        the ones dropped by the solver are flagged as `dropped`
+        """
+        solvables, dropped = self.add_dropped(solvables, weakened)
+        # solvables to read 
         # update information from repo
-        updateinfo_sel = self.pool.Selection()
+        updateinfo_solvables = []
         data = {}
         for s in solvables:
-            str_name = s.lookup_str(solv.SOLVABLE_NAME)
-            str_arch = s.lookup_str(solv.SOLVABLE_ARCH)
-            str_evr = s.lookup_str(solv.SOLVABLE_EVR)
-            num_buildtime = s.lookup_num(solv.SOLVABLE_BUILDTIME)
-            str_vendor = s.lookup_str(solv.SOLVABLE_VENDOR)
-            str_summary = s.lookup_str(solv.SOLVABLE_SUMMARY)
-            str_description = s.lookup_str(solv.SOLVABLE_DESCRIPTION)
-            provides = self.get_array(s, solv.SOLVABLE_PROVIDES)
-            requires = self.get_array(s, solv.SOLVABLE_REQUIRES)
-            # do not display filelist, obsolete & conflict
-            # since those attributes are removed from pool 
-            # to avoid problem solving
-            #filelist = self.get_array(s, solv.SOLVABLE_FILELIST)
-            #import pdb; pdb.set_trace()
-
-            nevra = "{}-{}.{}".format(str_name, str_evr, str_arch)
-            # update or insert errata in packages list
-            na = "{}.{}".format(str_name, str_arch)
-            # 1:3.0.12-17.el7
-            ma = evr_re.match(str_evr)
-            if ma is not None:
-                md = ma.groupdict()
-                e = md['epoch']
-                if not e:
-                    epoch = '0'
-                else :
-                    epoch = e
-                version = ma['version']
-                release = ma['release']
-            if release:
-                frmt_str = '{epoch}:{name}-{version}.{release}.{arch}'
-            else:
-                frmt_str = '{epoch}:{name}-{version}.{arch}'
-            df = {
-                'name': str_name,
-                'epoch': epoch,
-                'release': release,
-                'version': version,
-                'arch': str_arch,
-            }
-            envra = frmt_str.format(**df)
-
-            d = OrderedDict((
-                ('nevra', nevra),
-                ('summary', str_summary),
-                ('description', str_description),
-                ('sourcepkg', s.lookup_sourcepkg()),
-                ('buildtime', num_buildtime),
-                ('vendor', str_vendor),
-                ('name', str_name),
-                ('epoch', epoch),
-                ('release', release),
-                ('version', version),
-                ('arch', str_arch),
-                ('evr', str_evr),
-                ('envra', envra),
-                ('repo', str(s.repo)),
-                ('provides', provides),
-                ('requires', requires),
-            ))
-            data[nevra] = d
-            updateinfos = [] 
+            d = self.format_solvable(s)
+            data[d['nevra']] = d
             # read all <= related packages
-            updateinfo_sel.add(s.Selection())
-            print("  - %s" % s)
+            updateinfo_solvables.append(s)
+            if d['nevra'] not in dropped:
+                print("  - %s" % s)
         
-        if updateinfo and updateinfo_sel:
-            self.build_updateinfo_stack(data, updateinfo_sel)
+        if updateinfo and updateinfo_solvables:
+            self.build_updateinfo_stack(data, updateinfo_solvables)
+
+        for nevra in weakened:
+            d = data.get(nevra, None)
+            if d:
+                d['weakened'] = True
+                if nevra in dropped:
+                    d['dropped'] = True
 
         # sort data's packages name
         # sorting is just to ease human reading
@@ -203,5 +351,239 @@ class data_json(object):
         ret = list(OrderedDict(sorted(data.items())).values())
         return ret
 
+    def records(self, solvables, updateinfo=True, weakened=(), show=True):
+        """
+        yield the package records in nevra order
+        records are built one at a time
+        """
+        solvables, dropped = self.add_dropped(solvables, weakened)
+        # gather the sort keys first
+        keys = {}
+        for s in solvables:
+            nevra = self.get_nevra(s)
+            keys[nevra] = s.id
+            if show and nevra not in dropped:
+                print("  - %s" % s)
+        index = None
+        if updateinfo and keys:
+            index = advisory_index.get(self.pool)
+        weakened = set(weakened)
+        for nevra in sorted(keys):
+            s = self.pool.solvables[keys[nevra]]
+            d = self.format_solvable(s)
+            if index is not None:
+                updateinfos = self.get_updateinfos(s, index)
+                if updateinfos:
+                    d["updateinfos"] = updateinfos
+            if nevra in weakened:
+                d['weakened'] = True
+                if nevra in dropped:
+                    d['dropped'] = True
+            yield d
+
+    def diff(self, path, solvables, updateinfo=True, weakened=()):
+        """
+        Compare the report to a previous data.json (path)
+        return the delta document
+          added: new package records
+          removed: nevra of the removed packages
+          changed: nevra, changed fields (new values, null when removed)
+            and updateinfos added/removed
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = {d['nevra']: d for d in json.load(f)}
+        delta = OrderedDict((('added', []), ('removed', []), ('changed', [])))
+        for d in self.records(solvables, updateinfo=updateinfo, 
+                weakened=weakened, show=False):
+            old = previous.pop(d['nevra'], None)
+            if old is None:
+                delta['added'].append(d)
+                continue
+            fields = OrderedDict()
+            for key in list(d) + [k for k in old if k not in d]:
+                if key in ('nevra', 'updateinfos'):
+                    continue
+                if d.get(key, None) != old.get(key, None):
+                    fields[key] = d.get(key, None)
+            updateinfos = self.diff_updateinfos(old.get('updateinfos', []), 
+                    d.get('updateinfos', []))
+            if fields or updateinfos:
+                change = OrderedDict((('nevra', d['nevra']), ('fields', fields)))
+                if updateinfos:
+                    change['updateinfos'] = updateinfos
+                delta['changed'].append(change)
+        delta['removed'] = sorted(previous)
+        return delta
+
+    def diff_updateinfos(self, old, new):
+        """
+        advisories are keyed by name and collection filename
+        a modified advisory is listed as added (replaced)
+        """
+        key = lambda i: (i['name'], i['collection_filename'])
+        old = {key(i): i for i in old}
+        added = []
+        for info in new:
+            if old.pop(key(info), None) != info:
+                added.append(info)
+        removed = [OrderedDict((('name', name), ('collection_filename', filename))) 
+                for name, filename in sorted(old)]
+        if not added and not removed:
+            return None
+        return OrderedDict((('added', added), ('removed', removed)))
+
+    def write(self, path, solvables, updateinfo=True, weakened=()):
+        """
+        Stream the report into path
+        (same output as json.dump(format(), indent=4))
+        the file is written to a temporary file
+        and renamed once complete
+        """
+        tmpname = None
+        try:
+            (fd, tmpname) = tempfile.mkstemp(prefix='.data-', 
+                    dir=os.path.dirname(os.path.abspath(path)))
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                sep = '[\n    '
+                for d in self.records(solvables, updateinfo=updateinfo, weakened=weakened):
+                    f.write(sep)
+                    f.write(json.dumps(d, ensure_ascii=False, indent=4).replace('\n', '\n    '))
+                    sep = ',\n    '
+                f.write('[]' if sep == '[\n    ' else '\n]')
+            os.rename(tmpname, path)
+            tmpname = None
+        finally:
+            if tmpname and os.path.exists(tmpname):
+                os.unlink(tmpname)
+
+class data_sqlite(data_json):
+    """
+    SQLite report
+      packages, strings (interned dependencies),
+      provides/requires (package_id, string_id),
+      advisories (one row per advisory), advisory_references, 
+      package_advisories (package_id, advisory_id, collection_filename)
+    """
+    schema = (
+        'CREATE TABLE strings (id INTEGER PRIMARY KEY, str TEXT NOT NULL)',
+        'CREATE TABLE packages (id INTEGER PRIMARY KEY, nevra TEXT, summary TEXT, '
+            'description TEXT, sourcepkg TEXT, buildtime INTEGER, vendor TEXT, '
+            'name TEXT, epoch TEXT, release TEXT, version TEXT, arch TEXT, '
+            'evr TEXT, envra TEXT, repo TEXT, weakened INTEGER, dropped INTEGER)',
+        'CREATE TABLE provides (package_id INTEGER, string_id INTEGER)',
+        'CREATE TABLE requires (package_id INTEGER, string_id INTEGER)',
+        'CREATE TABLE advisories (id INTEGER PRIMARY KEY, name TEXT, '
+            'patchcategory TEXT, severity TEXT, buildtime INTEGER, reboot TEXT)',
+        'CREATE TABLE advisory_references (advisory_id INTEGER, reference_id TEXT, '
+            'reference_title TEXT, reference_href TEXT, reference_type TEXT)',
+        'CREATE TABLE package_advisories (package_id INTEGER, advisory_id INTEGER, '
+            'collection_filename TEXT)',
+    )
+    # created once the tables are loaded
+    indexes = (
+        'CREATE UNIQUE INDEX strings_str ON strings (str)',
+        'CREATE UNIQUE INDEX packages_nevra ON packages (nevra)',
+        'CREATE INDEX packages_name ON packages (name, arch)',
+        'CREATE INDEX packages_sourcepkg ON packages (sourcepkg)',
+        'CREATE INDEX provides_string ON provides (string_id)',
+        'CREATE INDEX provides_package ON provides (package_id)',
+        'CREATE INDEX requires_string ON requires (string_id)',
+        'CREATE INDEX requires_package ON requires (package_id)',
+        'CREATE INDEX advisories_name ON advisories (name)',
+        'CREATE INDEX advisory_references_advisory ON advisory_references (advisory_id)',
+        'CREATE INDEX package_advisories_package ON package_advisories (package_id)',
+        'CREATE INDEX package_advisories_advisory ON package_advisories (advisory_id)',
+    )
+    columns = ('nevra', 'summary', 'description', 'sourcepkg', 'buildtime', 'vendor',
+            'name', 'epoch', 'release', 'version', 'arch', 'evr', 'envra', 'repo')
+
+    def __init__(self, pool):
+        super().__init__(pool)
+        # id(advisory record) -> advisory (name id, evr id)
+        # the same advisory of several repos is one row
+        self.advisory_ids = {}
+
+    def get_updateinfo(self, solvable, str_col_filename):
+        info = super().get_updateinfo(solvable, str_col_filename)
+        # records are kept by self.advisories
+        # so their id is stable
+        self.advisory_ids[id(info)] = (solvable.nameid, solvable.evrid)
+        return info
+
+    def write(self, path, solvables, updateinfo=True, weakened=()):
+        """
+        Write the report into a new SQLite database
+        the file is written to a temporary file
+        and renamed once complete
+        """
+        tmpname = None
+        try:
+            (fd, tmpname) = tempfile.mkstemp(prefix='.data-', 
+                    dir=os.path.dirname(os.path.abspath(path)))
+            os.fchmod(fd, 0o644)
+            os.close(fd)
+            db = sqlite3.connect(tmpname)
+            try:
+                self.load(db, solvables, updateinfo=updateinfo, weakened=weakened)
+            finally:
+                db.close()
+            os.rename(tmpname, path)
+            tmpname = None
+        finally:
+            if tmpname and os.path.exists(tmpname):
+                os.unlink(tmpname)
+
+    def load(self, db, solvables, updateinfo=True, weakened=()):
+        strings = {}
+        advisories = {}
+        packages = []
+        provides = []
+        requires = []
+        advisory_rows = []
+        reference_rows = []
+        links = []
+
+        def intern(string):
+            string_id = strings.get(string, None)
+            if string_id is None:
+                string_id = len(strings) + 1
+                strings[string] = string_id
+            return string_id
 
+        for package_id, d in enumerate(self.records(solvables, 
+                updateinfo=updateinfo, weakened=weakened), 1):
+            packages.append((package_id,) + tuple(d[c] for c in self.columns) 
+                    + (int(d.get('weakened', False)), int(d.get('dropped', False))))
+            provides += [(package_id, intern(p)) for p in d['provides']]
+            requires += [(package_id, intern(r)) for r in d['requires']]
+            for info in d.get('updateinfos', ()):
+                # one advisory row per advisory (name, evr)
+                # the collection filename belongs to the link
+                key = self.advisory_ids[id(info)]
+                advisory_id = advisories.get(key, None)
+                if advisory_id is None:
+                    advisory_id = len(advisories) + 1
+                    advisories[key] = advisory_id
+                    advisory_rows.append((advisory_id, info['name'], info['patchcategory'], 
+                        info['severity'], info['buildtime'], info['reboot']))
+                    reference_rows += [(advisory_id, r['reference_id'], r['reference_title'], 
+                        r['reference_href'], r['reference_type']) for r in info['references']]
+                links.append((package_id, advisory_id, info['collection_filename']))
 
+        logger.info('Load `{}` packages into SQLite'.format(len(packages)))
+        with db:
+            # single transaction
+            for statement in self.schema:
+                db.execute(statement)
+            db.executemany('INSERT INTO strings VALUES (?, ?)', 
+                    ((string_id, string) for string, string_id in strings.items()))
+            db.executemany('INSERT INTO packages VALUES ({})'.format(
+                ', '.join('?' * (len(self.columns) + 3))), packages)
+            db.executemany('INSERT INTO provides VALUES (?, ?)', provides)
+            db.executemany('INSERT INTO requires VALUES (?, ?)', requires)
+            db.executemany('INSERT INTO advisories VALUES (?, ?, ?, ?, ?, ?)', advisory_rows)
+            db.executemany('INSERT INTO advisory_references VALUES (?, ?, ?, ?, ?)', reference_rows)
+            db.executemany('INSERT INTO package_advisories VALUES (?, ?, ?)', links)
+            for statement in self.indexes:
+                db.execute(statement)
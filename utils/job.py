@@ -2,6 +2,8 @@
 import solv
 import logging
 
+from utils.evr import evr_ladder
+
 logger = logging.getLogger(__name__)
 
 class JobSolver(object):
@@ -13,6 +15,7 @@ class JobSolver(object):
         self.pool = pool
         self.repos = repos
         self.sel_filter = pool.Selection_all()
+        self.evr = evr_ladder.get(pool)
 
     def get_update_collection_selection(self, sel, sel_filter=None, operator='='):
         """
@@ -83,12 +86,10 @@ class JobSolver(object):
                     # the aim is to limit the number of
                     # problem to solv by pruning 
                     # duplicated package first
-                    str_name = s.lookup_str(solv.SOLVABLE_NAME)
-                    str_arch = s.lookup_str(solv.SOLVABLE_ARCH)
-                    na = "{}.{}".format(str_name, str_arch)
+                    na = (s.nameid, s.archid)
                     other = ids.get(na, None)
                     if other is not None:
-                        if s.evrcmp(other) == 1:
+                        if self.evr.cmp(s, other) == 1:
                             keep = s
                         else:
                             keep = other
@@ -0,0 +1,150 @@
+import solv
+import multiprocessing
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def partition_jobs(pool, jobs):
+    """
+    Group jobs into connected components
+    of the requires/provides graph
+    solvables sharing a name are kept together
+    since they compete for the same install slot
+    return a list of (job list, multiversion solvable ids)
+    the multiversion solvables are all the versions
+    of the names reached by the component
+    """
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        # path compression
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+
+    queue = []
+    visited = set()
+    names = {}
+    job_ids = []
+    for job in jobs:
+        ids = [s.id for s in job.solvables()]
+        job_ids.append(ids)
+        for sid in ids[1:]:
+            union(ids[0], sid)
+        for sid in ids:
+            if sid not in visited:
+                visited.add(sid)
+                queue.append(sid)
+
+    # walk the dependency closure
+    while queue:
+        sid = queue.pop()
+        s = pool.solvables[sid]
+        other = names.setdefault(s.nameid, sid)
+        union(other, sid)
+        for dep in s.lookup_deparray(solv.SOLVABLE_REQUIRES):
+            for p in pool.whatprovides(dep):
+                union(sid, p.id)
+                if p.id not in visited:
+                    visited.add(p.id)
+                    queue.append(p.id)
+
+    # root -> name ids reached by the component
+    component_names = {}
+    for nameid, sid in names.items():
+        component_names.setdefault(find(sid), set()).add(nameid)
+    versions = {}
+    for s in pool.solvables_iter():
+        versions.setdefault(s.nameid, []).append(s.id)
+
+    components = {}
+    isolated = []
+    for job, ids in zip(jobs, job_ids):
+        if not ids:
+            isolated.append(([job], []))
+            continue
+        root = find(ids[0])
+        if root not in components:
+            multiversion = []
+            for nameid in component_names.get(root, ()):
+                multiversion += versions.get(nameid, [])
+            components[root] = ([], multiversion)
+        components[root][0].append(job)
+    return list(components.values()) + isolated
+
+# (pool, new_solver) inherited by forked workers
+_worker_state = None
+
+def _solve_component(component):
+    """
+    return the installed solvable ids,
+    the pool changes made by the problem loop
+    and the weakened solvables
+    """
+    pool, new_solver = _worker_state
+    jobs, multiversion = component
+    jobs = [pool.Job(how, what) for how, what in jobs]
+    problem_solver = new_solver(pool, multiversion)
+    try:
+        solver = problem_solver.run_problem_loop(jobs)
+        trans = solver.transaction()
+        ids = []
+        # jobs are (fake) installs
+        for cl in trans.classify(solv.Transaction.SOLVER_TRANSACTION_SHOW_OBSOLETES |
+                solv.Transaction.SOLVER_TRANSACTION_OBSOLETE_IS_UPGRADE):
+            if cl.type == solv.Transaction.SOLVER_TRANSACTION_INSTALL:
+                ids += [s.id for s in cl.solvables()]
+        return ids, problem_solver.export_pool_changes(), problem_solver.weakened
+    finally:
+        # the worker may solve another component
+        problem_solver.restore_pool()
+
+def solve_partitioned(pool, jobs, new_solver, workers=1):
+    """
+    Solve each jobs component with its own problem loop
+    new_solver(pool, multiversion) returns a problem solver
+    which marks only the multiversion solvable ids as multiversion
+    components are solved in forked workers when workers > 1
+
+    return the merged installed solvable ids, pool changes
+    and weakened solvables
+    the multiversion alignment of a component may differ 
+    from the others (reverse deps are not part of the partition)
+    so the merged ids must be aligned again
+    """
+    global _worker_state
+    components = partition_jobs(pool, jobs)
+    print("Jobs partitioned into `{}` components".format(len(components)))
+    # solve the biggest components first
+    components.sort(key=lambda c: len(c[0]), reverse=True)
+    payload = [([(job.how, job.what) for job in c], multiversion) 
+            for c, multiversion in components]
+
+    ids = {}
+    changes = []
+    weakened = []
+    _worker_state = (pool, new_solver)
+    try:
+        if workers > 1 and len(payload) > 1:
+            ctx = multiprocessing.get_context('fork')
+            with ctx.Pool(min(workers, len(payload))) as workers_pool:
+                results = list(workers_pool.imap_unordered(_solve_component, payload))
+        else:
+            results = [_solve_component(c) for c in payload]
+    finally:
+        _worker_state = None
+    for c_ids, c_changes, c_weakened in results:
+        for sid in c_ids:
+            ids[sid] = True
+        changes += c_changes
+        weakened += c_weakened
+    return list(ids), changes, weakened
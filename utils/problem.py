@@ -6,17 +6,174 @@ import logging
 logger = logging.getLogger(__name__)
 
 from abc import abstractmethod
+from array import array
+from collections import Counter
 import time
 
+from utils.evr import evr_ladder
+from utils.trace import rule_type_name
+
+class job_stack(object):
+    """
+    Job stack stored as contiguous (how, what) integer arrays
+
+    removed jobs are kept as SOLVER_NOOP tombstones 
+    so solutions' element.jobidx stay valid until compact()
+    solv.Job objects are built when the stack is handed 
+    to the solver and reused until their slot changes
+    """
+
+    def __init__(self, pool, jobs=()):
+        self.pool = pool
+        self.how = array('i')
+        self.what = array('i')
+        # built solv.Job objects (None when not built yet)
+        self.objs = []
+        # (how, what) pairs count for `in` tests
+        self.pairs = Counter()
+        for job in jobs:
+            self.append(job)
+
+    def __len__(self):
+        return len(self.how)
+
+    def __getitem__(self, idx):
+        job = self.objs[idx]
+        if job is None:
+            job = self.pool.Job(self.how[idx], self.what[idx])
+            self.objs[idx] = job
+        return job
+
+    def __setitem__(self, idx, job):
+        self.set(idx, job.how, job.what)
+        self.objs[idx] = job
+
+    def __iter__(self):
+        for idx in range(len(self.how)):
+            yield self[idx]
+
+    def __contains__(self, job):
+        return self.pairs[(job.how, job.what)] > 0
+
+    def set(self, idx, how, what=None):
+        if what is None:
+            what = self.what[idx]
+        self.pairs[(self.how[idx], self.what[idx])] -= 1
+        self.how[idx] = how
+        self.what[idx] = what
+        self.pairs[(how, what)] += 1
+        self.objs[idx] = None
+
+    def set_how(self, idx, how):
+        self.set(idx, how)
+
+    def append(self, job):
+        self.how.append(job.how)
+        self.what.append(job.what)
+        self.objs.append(job)
+        self.pairs[(job.how, job.what)] += 1
+
+    def jobs(self):
+        """
+        return the solv.Job list expected by solver.solve()
+        """
+        return [self[idx] for idx in range(len(self.how))]
+
+    def compact(self, dead):
+        """
+        drop tombstones, job idx are shifted
+        """
+        keep = [idx for idx in range(len(self.how)) if idx not in dead]
+        self.how = array('i', (self.how[idx] for idx in keep))
+        self.what = array('i', (self.what[idx] for idx in keep))
+        self.objs = [self.objs[idx] for idx in keep]
+        self.pairs = Counter(zip(self.how, self.what))
+
 class AbstractProblemSolver:
 
-    def __init__(self, pool):
+    def __init__(self, pool, multifix=False, trace=None, checkpoint=None, fixcache=None,
+            max_time=None, max_iterations=None):
         self.pool = pool
+        # name.arch evr index shared by the pool users
+        self.evr = evr_ladder.get(pool)
+        # apply all non overlapping rule fixes 
+        # of each solver pass
+        self.multifix = multifix
         self.loop_control = []
-        self.jobs = []
+        self.jobs = job_stack(pool)
         self.new_jobs = []
+        # solving budget of all the problem loops
+        # (max_iterations and/or max_time), without budget
+        # each problem loop is limited to loop_limit iterations
+        # problematic jobs are weakened once it is exhausted
         self.loop_limit = 3000
+        self.max_iterations = max_iterations
+        self.max_time = max_time
+        self.start_time = None
+        self.iterations = 0
+        self.budget_reported = False
+        # nevra of the solvables of weakened jobs
+        self.weakened = []
+        # job index updated in place 
+        # name -> {(idx, solvable id): (idx, solvable)}
         self.cache = {}
+        # (name, evr, arch) -> {(idx, solvable id): (idx, solvable)}
+        self.nevra_cache = {}
+        # idx -> [(name, evr, arch, solvable id)]
+        self.job_keys = {}
+        # idx of SOLVER_NOOP jobs
+        self.noop_jobs = set()
+        # pool dependencies changed by the problem loop
+        # (keyname, solvable id, original dependencies)
+        self.pool_changes = []
+        # whatprovides must be rebuilt 
+        # only if pool dependencies changed
+        self.pool_changed = False
+        # problem loop iterations 
+        # with and without whatprovides rebuild
+        self.stats = {'rebuild': 0, 'no_rebuild': 0}
+        # problem_trace (optional) 
+        # and the record of the current iteration
+        self.trace = trace
+        self.trace_record = None
+        # problem_checkpoint (optional)
+        # keyed by the request jobs
+        self.checkpoint = checkpoint
+        self.checkpoint_key = None
+        # outer loop round (saved in checkpoints)
+        self.round = 0
+        # fix_cache (optional) 
+        # learned fixes are applied once
+        self.fixcache = fixcache
+        self.fixcache_applied = False
+
+    def _trace(self, key, item):
+        """
+        append item to the current trace record
+        """
+        if self.trace_record is not None:
+            self.trace_record[key].append(item)
+
+    def _trace_rule(self, rule, problem):
+        """
+        count the rule (and its infos) fixed in the current iteration
+        """
+        if self.trace_record is None:
+            return
+        rule_name = rule_type_name(rule.type)
+        rules = self.trace_record['rules']
+        rules[rule_name] = rules.get(rule_name, 0) + 1
+        infos = []
+        rule_infos = self.trace_record['rule_infos']
+        for ri in rule.allinfos():
+            info_name = rule_type_name(ri.type)
+            rule_infos[info_name] = rule_infos.get(info_name, 0) + 1
+            infos.append(ri.problemstr())
+        self.trace_record['fixes'].append({
+            'problem': problem.id, 
+            'rule': rule_name, 
+            'infos': infos,
+        })
 
     @abstractmethod
     def solv_problems(self, problems):
@@ -29,47 +186,342 @@ class AbstractProblemSolver:
         """
         # flush cache
         self.cache = {}
+        self.nevra_cache = {}
+        self.job_keys = {}
+        self.noop_jobs = set()
         logger.debug("Build job cache for jobs: `{}`".format(len(self.jobs)))
         for idx, job in enumerate(self.jobs):
-            for s in job.solvables():
-                data = self.cache.get(s.name, [])
-                d = (idx, job, s)
-                data.append(d) 
-                self.cache[s.name] = data
+            self.__index_job(idx, job)
+
+    def __index_job(self, idx, job):
+        """
+        add active jobs to the cache
+        SOLVER_MULTIVERSION and SOLVER_NOOP jobs are never searched
+        """
+        how = job.how & solv.Job.SOLVER_JOBMASK
+        if how == solv.Job.SOLVER_NOOP:
+            self.noop_jobs.add(idx)
+            return
+        if how == solv.Job.SOLVER_MULTIVERSION:
+            return
+        keys = []
+        for s in job.solvables():
+            name = s.name
+            nevra = (name, s.evr, s.arch)
+            d = (idx, s)
+            self.cache.setdefault(name, {})[(idx, s.id)] = d
+            self.nevra_cache.setdefault(nevra, {})[(idx, s.id)] = d
+            keys.append(nevra + (s.id,))
+        self.job_keys[idx] = keys
+
+    def __unindex_job(self, idx):
+        self.noop_jobs.discard(idx)
+        for name, evr, arch, sid in self.job_keys.pop(idx, ()):
+            for cache, key in ((self.cache, name), (self.nevra_cache, (name, evr, arch))):
+                data = cache[key]
+                del data[(idx, sid)]
+                if not data:
+                    del cache[key]
+
+    def set_job(self, idx, job):
+        """
+        Replace jobs[idx] and update the cache
+        """
+        self._trace('mutations', {'op': 'set_job', 
+            'old': str(self.jobs[idx]), 'job': str(job)})
+        self.__unindex_job(idx)
+        self.jobs[idx] = job
+        self.__index_job(idx, job)
+
+    def add_job(self, job):
+        """
+        Append a job to the stack and update the cache
+        """
+        self._trace('mutations', {'op': 'add_job', 'job': str(job)})
+        self.jobs.append(job)
+        self.__index_job(len(self.jobs) - 1, job)
 
     def run_problem_loop(self, jobs):
         self.loop_count = 0
+        if self.max_iterations is None and self.max_time is None:
+            # per problem loop limit
+            self.budget_reported = False
+        self.stats = {'rebuild': 0, 'no_rebuild': 0}
+        if not isinstance(jobs, job_stack):
+            jobs = job_stack(self.pool, jobs)
         self.jobs = jobs
+        self.build_job_cache()
+        if self.checkpoint:
+            if self.checkpoint_key is None:
+                self.checkpoint_key = self.checkpoint.key(self.jobs.jobs())
+            if self.checkpoint.resume:
+                state = self.checkpoint.load(self.checkpoint_key)
+                if state:
+                    self.__restore_state(state)
+                    # the state includes the applied fixes
+                    self.fixcache_applied = True
+        self.apply_learned_fixes()
+        if self.start_time is None:
+            self.start_time = time.monotonic()
         flags = solv.Solver.SOLVER_FLAG_SPLITPROVIDES \
             | solv.Solver.SOLVER_FLAG_NO_INFARCHCHECK \
             #| solv.Solver.SOLVER_FLAG_BEST_OBEY_POLICY \
         
         while True:
             self.loop_count += 1
-            # do not allow the script to run more than 3000 loop
-            assert (self.loop_count <= self.loop_limit),"Loop count limit reached"
+            self.iterations += 1
             # use a new solver to 
             # avoid error SOLVER_RULE_PKG
             # "some dependency problem"
             # and crash
+            if self.trace:
+                self.trace_record = {
+                    'iteration': self.loop_count,
+                    'jobs': len(self.jobs) - len(self.noop_jobs),
+                    'noop_jobs': len(self.noop_jobs),
+                    'problems': 0,
+                    'rules': {}, 
+                    'rule_infos': {},
+                    'fixes': [],
+                    'mutations': [],
+                    'time': {},
+                }
+            start = time.monotonic()
             solver = self.pool.Solver()
             solver.set_flag(flags, 1)
-            problems = solver.solve(self.jobs)
+            problems = solver.solve(self.jobs.jobs())
+            self.__trace_time('solve', start)
             if not problems:
+                self.__trace_write()
                 break
-            self.build_job_cache()
-            self.solv_problems(problems)
+            if self.trace_record is not None:
+                self.trace_record['problems'] = len(problems)
+            if self.budget_exhausted():
+                # best effort: give up fixing
+                # and let the solver drop the problematic jobs
+                if not self.weaken_problem_jobs(problems):
+                    assert self.weaken_all_jobs(), "Unable to weaken problem jobs"
+            else:
+                self.solv_problems(problems)
             
             #self.remove_duplicated_names()
+            # new jobs are appended to keep 
+            # the cached job idx valid
+            start = time.monotonic()
+            for job in self.new_jobs:
+                self.add_job(job)
+            self.new_jobs = []
             self.clear_noop_jobs()
-            if len(self.new_jobs):
-                self.jobs = self.new_jobs + self.jobs
-                self.new_jobs = []
+            self.__trace_time('cache', start)
 
             # reload modified deps
-            self.pool.createwhatprovides()
+            start = time.monotonic()
+            if self.pool_changed:
+                self.pool.createwhatprovides()
+                self.pool_changed = False
+                self.stats['rebuild'] += 1
+            else:
+                self.stats['no_rebuild'] += 1
+            self.__trace_time('whatprovides', start)
+            self.__trace_write()
+
+            if self.checkpoint and self.loop_count % self.checkpoint.every == 0:
+                self.write_checkpoint()
+        print("Problem loop iterations: `{}`, " \
+                "with whatprovides rebuild: `{}`, " \
+                "without: `{}`".format(self.loop_count, 
+                    self.stats['rebuild'], self.stats['no_rebuild']))
         return solver
 
+    def budget_exhausted(self):
+        """
+        return True once max iterations or max time is reached
+        (loop_limit iterations of the current loop without budget)
+        """
+        if self.max_iterations is None and self.max_time is None:
+            exhausted = self.loop_count > self.loop_limit
+        else:
+            exhausted = self.max_iterations is not None \
+                    and self.iterations > self.max_iterations
+        if not exhausted and self.max_time is not None:
+            exhausted = time.monotonic() - self.start_time > self.max_time
+        if exhausted and not self.budget_reported:
+            self.budget_reported = True
+            print("Solving budget exhausted after `{}` iterations " \
+                    "and `{:.1f}`s, weaken problem jobs".format(self.iterations, 
+                        time.monotonic() - self.start_time))
+        return exhausted
+
+    def weaken_job(self, idx):
+        """
+        Set SOLVER_WEAK on jobs[idx]
+        return False if the job can not be weakened
+        """
+        job = self.jobs[idx]
+        how = job.how & solv.Job.SOLVER_JOBMASK
+        if how in (solv.Job.SOLVER_NOOP, solv.Job.SOLVER_MULTIVERSION) \
+                or job.how & solv.Job.SOLVER_WEAK:
+            return False
+        self._trace('mutations', {'op': 'weaken_job', 'job': str(job)})
+        self.jobs.set_how(idx, job.how | solv.Job.SOLVER_WEAK)
+        self.weakened += [str(s) for s in job.solvables()]
+        logger.info('Weaken job `{}`'.format(job))
+        return True
+
+    def weaken_problem_jobs(self, problems):
+        """
+        Weaken the jobs of the problems' job solutions
+        return the number of weakened jobs
+        """
+        count = 0
+        for problem in problems:
+            for solution in problem.solutions():
+                for element in solution.elements():
+                    if element.type == solv.Solver.SOLVER_SOLUTION_JOB:
+                        count += self.weaken_job(element.jobidx)
+        return count
+
+    def weaken_all_jobs(self):
+        """
+        last resort when no job solution is available
+        """
+        count = 0
+        for idx in range(len(self.jobs)):
+            count += self.weaken_job(idx)
+        return count
+
+    def _learn_fix(self, rule_name, solvable, detail, fix):
+        """
+        record a fix in the fix cache
+        """
+        if self.fixcache is not None:
+            signature = self.fixcache.signature(rule_name, solvable, detail)
+            self.fixcache.learn(signature, fix)
+
+    def apply_learned_fixes(self):
+        """
+        apply the fixes of the fix cache
+        whose solvables still exist before the first solve
+        """
+        if self.fixcache is None or self.fixcache_applied:
+            return
+        self.fixcache_applied = True
+        if not self.fixcache.fixes:
+            return
+        solvables = {str(s): s for s in self.pool.solvables_iter()}
+        count = 0
+        for signature, fixes in self.fixcache.fixes.items():
+            try:
+                resolved = [[solvables[nevra] for nevra in fix['solvables']] 
+                        for fix in fixes]
+            except (KeyError, TypeError):
+                # stale fix
+                continue
+            applied = [fix for fix, s in zip(fixes, resolved) if self.__apply_fix(fix, s)]
+            if applied:
+                self.fixcache.applied[signature] = applied
+                count += len(applied)
+        for job in self.new_jobs:
+            self.add_job(job)
+        self.new_jobs = []
+        if self.pool_changed:
+            self.pool.createwhatprovides()
+            self.pool_changed = False
+        print("Learned fixes applied: `{}`".format(count))
+
+    def __apply_fix(self, fix, solvables):
+        op = fix.get('op', None)
+        if op == 'remove_solvable':
+            self.remove_solvable_from_jobs(solvables[0], fix.get('preserve', 0))
+        elif op == 'remove_dep':
+            for dep in solvables[0].lookup_deparray(solv.SOLVABLE_REQUIRES):
+                if dep.str() == fix.get('dep', None):
+                    self.remove_dep_from_solvable(dep, solvables[0])
+                    break
+            else:
+                return False
+        elif op == 'unset_conflicts':
+            self.unset_conflicts(solvables[0])
+        elif op == 'multiversion':
+            self._set_multiversion(solvables[0])
+        elif op == 'replace':
+            leaf, next_solvable = solvables
+            found = False
+            for idx, job, s in self.search_solvables_from_cache(name=leaf.name, evr=leaf.evr, arch=leaf.arch):
+                self.remove_job(idx)
+                found = True
+            if not found:
+                return False
+            flags = solv.Job.SOLVER_INSTALL | solv.Job.SOLVER_TARGETED | solv.Job.SOLVER_SOLVABLE
+            self.new_jobs.append(self.pool.Job(flags, next_solvable.id))
+        else:
+            return False
+        return True
+
+    def _set_multiversion(self, solvable):
+        """
+        allow multi install of the solvable name
+        and install the solvable
+        return False if it was already done
+        """
+        key = "`{}` SOLVER_MULTIVERSION".format(solvable.name)
+        if key in self.loop_control: 
+            return False
+        self.loop_control.append(key)
+        flags = solv.Job.SOLVER_INSTALL | solv.Job.SOLVER_TARGETED | solv.Job.SOLVER_SOLVABLE
+        sub_query = self.pool.select(solvable.name, solv.Selection.SELECTION_NAME)
+        self.new_jobs += sub_query.jobs(solv.Job.SOLVER_MULTIVERSION)
+        self.new_jobs.append(self.pool.Job(flags, solvable.id))
+        return True
+
+    def write_checkpoint(self):
+        """
+        save the current state in the checkpoint
+        """
+        self.checkpoint.write(self.checkpoint_key, self.__dump_state())
+
+    def __dump_state(self):
+        """
+        return the problem loop state as json data
+        """
+        return {
+            'round': self.round,
+            'loop_count': self.loop_count,
+            'iterations': self.iterations,
+            'weakened': self.weakened,
+            'how': self.jobs.how.tolist(),
+            'what': self.jobs.what.tolist(),
+            'loop_control': self.loop_control,
+            'new_jobs': [[job.how, job.what] for job in self.new_jobs],
+            'pool_changes': self.export_pool_changes(),
+            'stats': self.stats,
+        }
+
+    def __restore_state(self, state):
+        """
+        load a state saved by __dump_state
+        """
+        self.round = state['round']
+        self.loop_count = state['loop_count']
+        self.iterations = state.get('iterations', self.loop_count)
+        self.weakened = state.get('weakened', [])
+        self.jobs = job_stack(self.pool, [self.pool.Job(how, what) 
+            for how, what in zip(state['how'], state['what'])])
+        self.loop_control = state['loop_control']
+        self.new_jobs = [self.pool.Job(how, what) for how, what in state['new_jobs']]
+        self.stats.update(state['stats'])
+        self.import_pool_changes(state['pool_changes'])
+        self.build_job_cache()
+
+    def __trace_time(self, key, start):
+        if self.trace_record is not None:
+            self.trace_record['time'][key] = round(time.monotonic() - start, 6)
+
+    def __trace_write(self):
+        if self.trace_record is not None:
+            self.trace.write(self.trace_record)
+            self.trace_record = None
+
     def exec_solution(self, solution):
         """
         exec element job based on libsolv solution object
@@ -78,17 +530,18 @@ class AbstractProblemSolver:
             logger.info("run element solution: `{}`".format(element.str()))
             newjob = element.Job()
             if element.type == solv.Solver.SOLVER_SOLUTION_JOB:
-                self.jobs[element.jobidx] = newjob
+                self.set_job(element.jobidx, newjob)
             else:
-                if newjob and newjob not in jobs:
-                    self.jobs.append(newjob)
+                if newjob and newjob not in self.jobs:
+                    self.add_job(newjob)
 
     def __get_solvables_from_cache(self, cache):
         """
         yield only valid jobs 
         SOLVER_MULTIVERSION and SOLVER_NOOP are ignored
         """
-        for idx, job, s in cache:
+        for idx, s in cache:
+            job = self.jobs[idx]
             how = job.how & solv.Job.SOLVER_JOBMASK
             if how != solv.Job.SOLVER_MULTIVERSION and how != solv.Job.SOLVER_NOOP:
                 #logger.debug("how {:02x} {} {} {}".format(how, idx, job, s))
@@ -99,14 +552,21 @@ class AbstractProblemSolver:
         use Cache hashtable to retrieve idx, job and solvable
         associated to a solvable name 
         """
-        if name is not None: 
-            c_jobs = self.cache.get(name, [])
+        if name is not None and set(kwargs) == {'evr', 'arch'}:
+            c_jobs = self.nevra_cache.get((name, kwargs['evr'], kwargs['arch']), {}).values()
+            kwargs = {}
+        elif name is not None: 
+            c_jobs = self.cache.get(name, {}).values()
         else: 
             # no name provided 
             # search in all jobs array
             # worst case 
             # flaten list of list
-            c_jobs = [ i for sub in self.cache.values() for i in sub ]
+            c_jobs = [ i for sub in self.cache.values() for i in sub.values() ]
+        # copy and keep the job stack order
+        # the cache may change while the caller 
+        # iterates over the results
+        c_jobs = sorted(c_jobs, key=lambda d: d[0])
         for idx, job, s in self.__get_solvables_from_cache(c_jobs):
             for key, arg in kwargs.items():
                 v = getattr(s, key)
@@ -129,14 +589,18 @@ class AbstractProblemSolver:
         # to keep valid element.jobidx 
         # for solutions
         job = self.jobs[idx]
+        self._trace('mutations', {'op': 'remove_job', 'job': str(job)})
         #logger.debug("how: {:02x} {}".format(job.how, job.solvables()))
         #how = job.how & solv.Job.SOLVER_JOBMASK
         #if how == solv.Job.SOLVER_MULTIVERSION:
         #    import pdb; pdb.set_trace()
-        job.how &= ~solv.Job.SOLVER_JOBMASK
+        self.jobs.set_how(idx, job.how & ~solv.Job.SOLVER_JOBMASK)
+        job = self.jobs[idx]
         # deleting job element from the array
         # may raise libsolv error 
         # so we use SOLVER_NOOP instead
+        self.__unindex_job(idx)
+        self.noop_jobs.add(idx)
         return job
            
     def remove_solvable_from_jobs(self, solvable, preserve=0):
@@ -171,13 +635,73 @@ class AbstractProblemSolver:
         since the original solvable object is modified
         """
         logger.info("Remove dep `{}` form solvable `{}`".format(dep.str(), solvable))
+        self._trace('mutations', {'op': 'remove_dep', 
+            'solvable': str(solvable), 'dep': dep.str()})
         requires = solvable.lookup_idarray(solv.SOLVABLE_REQUIRES)
+        self.pool_changes.append((solv.SOLVABLE_REQUIRES, solvable.id, list(requires)))
+        self.pool_changed = True
         solvable.unset(solv.SOLVABLE_REQUIRES)
         if dep.id in requires: 
             requires.remove(dep.id)
         for d in requires:
             solvable.add_deparray(solv.SOLVABLE_REQUIRES, d)
 
+    def unset_conflicts(self, solvable):
+        """
+        Remove solvable conflicts
+        """
+        conflicts = solvable.lookup_idarray(solv.SOLVABLE_CONFLICTS)
+        if conflicts:
+            self._trace('mutations', {'op': 'unset_conflicts', 'solvable': str(solvable)})
+            self.pool_changes.append((solv.SOLVABLE_CONFLICTS, solvable.id, list(conflicts)))
+            self.pool_changed = True
+        solvable.unset(solv.SOLVABLE_CONFLICTS)
+
+    def restore_pool(self):
+        """
+        Revert pool dependencies changed by the problem loop
+        so the pool can be reused for another solving
+        """
+        if not self.pool_changes:
+            return
+        logger.debug("Restore `{}` pool changes".format(len(self.pool_changes)))
+        for keyname, solvable_id, deps in reversed(self.pool_changes):
+            solvable = self.pool.solvables[solvable_id]
+            solvable.unset(keyname)
+            for d in deps:
+                solvable.add_deparray(keyname, d)
+        self.pool_changes = []
+        self.pool_changed = False
+        self.pool.createwhatprovides()
+
+    def export_pool_changes(self):
+        """
+        return the current dependencies of the solvables
+        changed by the problem loop
+        """
+        ret = {}
+        for keyname, solvable_id, deps in self.pool_changes:
+            solvable = self.pool.solvables[solvable_id]
+            ret[(keyname, solvable_id)] = list(solvable.lookup_idarray(keyname))
+        return [(keyname, solvable_id, deps) for (keyname, solvable_id), deps in ret.items()]
+
+    def import_pool_changes(self, changes):
+        """
+        apply changes exported by another problem solver
+        (i.e: forked process)
+        """
+        for keyname, solvable_id, deps in changes:
+            solvable = self.pool.solvables[solvable_id]
+            self.pool_changes.append((keyname, solvable_id, 
+                list(solvable.lookup_idarray(keyname))))
+            solvable.unset(keyname)
+            for d in deps:
+                solvable.add_deparray(keyname, d)
+            self.pool_changed = True
+        if self.pool_changed:
+            self.pool.createwhatprovides()
+            self.pool_changed = False
+
     def remove_duplicated_names(self):
         """
         Remove duplicated solvable from job stack
@@ -190,15 +714,13 @@ class AbstractProblemSolver:
             # the aim is to limit the number of
             # problem to solv by pruning 
             # duplicated package first
-            str_name = s.lookup_str(solv.SOLVABLE_NAME)
-            str_arch = s.lookup_str(solv.SOLVABLE_ARCH)
-            na = "{}.{}".format(str_name, str_arch)
+            na = (s.nameid, s.archid)
             other, oidx = ids.get(na, (None, None))
             #print("how: {:02x} {}".format(job.how, job.solvables()))
 
             job = None
             if other is not None:
-                if s.evrcmp(other) == 1:
+                if self.evr.cmp(s, other) == 1:
                     keep = s
                     kidx = idx
                     job = self.remove_job(oidx)
@@ -218,15 +740,16 @@ class AbstractProblemSolver:
         Remove NOOP 'do nothing' jobs form job stack
         clear 'do nothing' job from list
         """
-        # the same jobs array is reused for the next round
-        for job in self.jobs: 
-            how = job.how & solv.Job.SOLVER_JOBMASK
-            if how == solv.Job.SOLVER_NOOP :
-                logger.info("End of loop job cleanup how: {:02x} " \
-                        "jobmask: {:02x} job: {} " \
-                        "sovlables: `{}`".format(job.how, how, job, job.solvables()))
-                #logger.info('Remove job {} from jobs stack'.format(job))
-                self.jobs.remove(job)
+        # NOOP jobs are harmless for the solver
+        # compact the stack only when they take 
+        # more than half of it, this shifts job idx 
+        # so the cache is rebuilt
+        if len(self.noop_jobs) * 2 <= len(self.jobs):
+            return
+        logger.info("End of loop job cleanup: `{}` NOOP jobs " \
+                "removed from `{}` jobs".format(len(self.noop_jobs), len(self.jobs)))
+        self.jobs.compact(self.noop_jobs)
+        self.build_job_cache()
 
 class InteractiveSolver(AbstractProblemSolver):
 
@@ -257,10 +780,10 @@ class InteractiveSolver(AbstractProblemSolver):
             for element in solution.elements():
                 newjob = element.Job()
                 if element.type == solv.Solver.SOLVER_SOLUTION_JOB:
-                    jobs[element.jobidx] = newjob
+                    self.set_job(element.jobidx, newjob)
                 else:
-                    if newjob and newjob not in jobs:
-                        jobs.append(newjob)
+                    if newjob and newjob not in self.jobs:
+                        self.add_job(newjob)
 
 class ProblemSolver(AbstractProblemSolver):
 
@@ -271,22 +794,9 @@ class ProblemSolver(AbstractProblemSolver):
 
         return None if no better version exists for this solvable
         """
-        # search all solvable greater than our origin
-        nevra = "{}.{} > {}".format(solvable.name, solvable.arch, solvable.evr)
-        pkg_sel = self.pool.select(nevra, 
-            solv.Selection.SELECTION_DOTARCH|solv.Selection.SELECTION_NAME|solv.Selection.SELECTION_REL)
-        ret = None
-        for other in pkg_sel.solvables():
-            if not ret:
-                ret = other
-            else: 
-                if ret.evrcmp(other) == 1:
-                    # ret > other
-                    # keep only the solvable next to 
-                    # our origin 
-                    logger.debug('Next solvable candidate found ' \
-                            'origin: `{}` (`{}` < `{}`)'.format(solvable, other, ret))
-                    ret = other
+        ret = self.evr.next(solvable)
+        logger.debug('Next solvable candidate found ' \
+                'origin: `{}` (`{}`)'.format(solvable, ret))
         return ret
 
     def _fix_pkg_requires_problem(self, solvable, requires, rule_info, problem, force=False):
@@ -306,21 +816,19 @@ class ProblemSolver(AbstractProblemSolver):
                     #remove_solvable_from_jobs(jobs, s_dep_leaf)
                     self.new_jobs.append(solvable.pool.Job(flags, next_solvable.id)) 
                     print('Replace solvable: `{}` by `{}` from job `{}`'.format(s_dep_leaf, next_solvable, job))
+                    self._learn_fix('SOLVER_RULE_PKG_REQUIRES', solvable, dep.str(),
+                            {'op': 'replace', 'solvables': [str(s_dep_leaf), str(next_solvable)]})
                     found = True
                 break
         
         if not found : 
             # allow multi install to avoid provide conflicts
             for req in requires + [solvable]:
-                key = "`{}` SOLVER_MULTIVERSION".format(req.name)
-                if key not in self.loop_control: 
-                    self.loop_control.append(key)
+                if self._set_multiversion(req):
                     print("Set solvable `{}` as SOLVER_MULTIVERSION " \
                             "to avoid provides conflicts".format(req))
-                    sub_query = solvable.pool.select(req.name, solv.Selection.SELECTION_NAME)
-                    install_job = self.pool.Job(flags, req.id)
-                    self.new_jobs += sub_query.jobs( solv.Job.SOLVER_MULTIVERSION )
-                    self.new_jobs.append(install_job) 
+                    self._learn_fix('SOLVER_RULE_PKG_REQUIRES', solvable, dep.str(),
+                            {'op': 'multiversion', 'solvables': [str(req)]})
                     found = True
         if not found and force:
             return self._fix_pkg_requires_solutions(solvable, 
@@ -425,12 +933,12 @@ class ProblemSolver(AbstractProblemSolver):
         for element in solutions[sol].elements(True):
             print('Run solution: #`{}` `{}`'.format(sol+1, element.str()))
             if 'do not ask to install' in element.str():
-                self.jobs[element.jobidx].how |= solv.Job.SOLVER_WEAK 
+                self.jobs.set_how(element.jobidx, self.jobs[element.jobidx].how | solv.Job.SOLVER_WEAK)
                 break
             # may raise seg fautl
             newjob = element.Job()
             if element.type == solv.Solver.SOLVER_SOLUTION_JOB:
-                jobs[element.jobidx] = newjob
+                self.set_job(element.jobidx, newjob)
             else: 
                 if newjob and newjob not in self.jobs:
                     self.new_jobs.append(newjob)
@@ -440,167 +948,251 @@ class ProblemSolver(AbstractProblemSolver):
     def solv_problems(self, problems):
         """
         Solve problems manually from console interactive prompt
+
+        multifix: the first problem rule is always fixed,
+        the other rules are fixed on top of it when they 
+        do not overlap the solvables fixed in this pass
         """
+        # solvables involved in the fixes of this pass
+        touched = set()
         for problem in problems:
             print("Problem loop: {}, {}/{}: " \
                     "`{}`".format(self.loop_count, 
                         problem.id, len(problems), problem))
-            #rules = problem.findallproblemrules()
             # read the first problem rule
-            rules = (problem.findproblemrule(),)
-            for rule in rules: 
-                #print(rule.type)
-                rule_all_infos = rule.allinfos()
-                if rule.type == solv.Solver.SOLVER_RULE_PKG:
-                    # A package dependency rule.
-                    #print('SOLVER_RULE_PKG package dependency rule.')
-                    for ri in rule_all_infos:
-                        #print(ri.problemstr())
-                        if ri.type == solv.Solver.SOLVER_RULE_PKG_SAME_NAME:
-                            print("SOLVER_RULE_PKG_SAME_NAME")
-                            other = ri.othersolvable
-                            s = ri.solvable
-                            # preserve : number of copies to keep in job
-                            preserve = 0
-                            if s.evrcmp(other) == 1:
-                                td = other
-                            elif str(s) == str(other):
-                                preserve = 1
-                                td = s
-                            else:
-                                td = s
-                            print("Compare solvables: `{}` to `{}`" \
-                                    " remove: `{}`" \
-                                    " and preserve: `{}`".format(s, other, td, preserve))
-                            found = self.remove_solvable_from_jobs(td, preserve)
-                            assert found
-                            break
-                        elif ri.type == solv.Solver.SOLVER_RULE_PKG_NOTHING_PROVIDES_DEP:
-                            print("SOLVER_RULE_PKG_NOTHING_PROVIDES_DEP")
-                            # example:
-                            # nothing provides python3.7dist(xmltodict) = 0.11.0 
-                            # needed by python3-pyvirtualize-0.9-6.20181003git57d2307.fc30.noarch
-                            print("Remove dep `{}` form solvable `{}`".format(ri.dep.str(), ri.solvable))
-                            self.remove_dep_from_solvable(ri.dep, ri.solvable)
-                            continue
-                        elif ri.type == solv.Solver.SOLVER_RULE_PKG_REQUIRES:
-                            print('SOLVER_RULE_PKG_REQUIRES') 
-                            # example:
-                            # package prelude-correlator-5.0.1-1.fc30.x86_64 
-                            # requires python3-prelude-correlator >= 5.0.0, 
-                            # but none of the providers can be installed
-                            
-                            s = ri.solvable
-                            d = ri.dep
-                            # do not try to solve the same deps twice
-                            req = self.pool.whatprovides(d)
-                            key = '`{}` dep `{}`'.format(s, d)
-                            force = False
-                            if key in self.loop_control:
-                                # force solver solution
-                                # if we meet the same 
-                                # problem twice
-                                force = True
-                                #interactive(jobs, [problem])
-                                #import pdb; pdb.set_trace()
-                            
-                            self.loop_control.append(key)
-                            
-                            if len(req):
-                                # the rep exists ( add new job to selection )
-                                # add duplicated package, 
-                                # the SOLVER_RULE_PKG_SAME_NAME will handle
-                                # the issue later
-                                # req may contains the same package 
-                                # futher time
-                                fixed = self._fix_pkg_requires_problem(s, req, ri, problem, force=force)
-                                break
-                            else: 
-                                print('dep not found for solvable: `{}` dep: `{}`'.format(s, d))
-                                self.remove_dep_from_solvable(ri.dep, ri.solvable)
-                                break
-                        elif ri.type == solv.Solver.SOLVER_RULE_PKG_CONFLICTS:
-                            print('SOLVER_RULE_PKG_CONFLICTS') 
-                            # example
-                            # package compat-openssl10-devel-1:1.0.2o-5.fc30.i686 
-                            # conflicts with openssl-devel provided 
-                            # by openssl-devel-1:1.1.1c-6.fc30.x86_64
-                            s = ri.solvable
-                            other = ri.othersolvable
-                            # remove conflicts to avoid problems resolution
-                            s.unset(solv.SOLVABLE_CONFLICTS)
-                            other.unset(solv.SOLVABLE_CONFLICTS)
-                            break
-                        elif ri.type == solv.Solver.SOLVER_RULE_PKG_OBSOLETES:
-                            print('SOLVER_RULE_PKG_OBSOLETES')
-                            # example
-                            # package infiniband-diags-2.0.0-2.el7.x86_64
-                            # obsoletes libibmad < 2.0.0-2.el7
-                            # provided by libibmad-1.3.13-1.el7.x86_64
-                            other = ri.othersolvable
-                            #s.unset(solv.SOLVABLE_OBSOLETES)
-                            self.remove_solvable_from_jobs(other)
-                            break
-                        else:
-                            print('uknown rule info {}'.format(ri.type))
-                            #import pdb; pdb.set_trace()
-                            exit(1)
+            rule = problem.findproblemrule()
+            self._trace_rule(rule, problem)
+            if not self.multifix:
+                self.solv_rule(rule, problem)
+                continue
+            self.solv_rule(rule, problem, multifix=True)
+            touched |= self.__get_rule_solvable_ids(rule)
+            for other in problem.findallproblemrules():
+                if other.id == rule.id:
+                    continue
+                ids = self.__get_rule_solvable_ids(other)
+                if ids & touched:
+                    # let the next solver pass 
+                    # report it again if needed
+                    logger.debug('Skip overlapping rule `{}`'.format(other))
+                    continue
+                self._trace_rule(other, problem)
+                self.solv_rule(other, problem, multifix=True)
+                touched |= ids
+
+    def __get_rule_solvable_ids(self, rule):
+        ids = set()
+        infos = rule.allinfos()
+        if not infos:
+            i = rule.info()
+            infos = [i] if i else []
+        for ri in infos:
+            for s in (ri.solvable, ri.othersolvable):
+                if s:
+                    ids.add(s.id)
+        return ids
+
+    def solv_rule(self, rule, problem, multifix=False):
+        """
+        Fix a problem rule
+        multifix: fix all the rule infos 
+        (only the first one otherwise)
+        """
+        #print(rule.type)
+        rule_all_infos = rule.allinfos()
+        if rule.type == solv.Solver.SOLVER_RULE_PKG:
+            # A package dependency rule.
+            #print('SOLVER_RULE_PKG package dependency rule.')
+            for ri in rule_all_infos:
+                #print(ri.problemstr())
+                if ri.type == solv.Solver.SOLVER_RULE_PKG_SAME_NAME:
+                    print("SOLVER_RULE_PKG_SAME_NAME")
+                    other = ri.othersolvable
+                    s = ri.solvable
+                    # preserve : number of copies to keep in job
+                    preserve = 0
+                    if s.evrcmp(other) == 1:
+                        td = other
+                    elif str(s) == str(other):
+                        preserve = 1
+                        td = s
                     else:
-                        # for allinfos loop
-                        if not rule_all_infos:
-                            i = rule.info()
-                            if i: 
-                                print('Problem allinfos not found: `{}` ' \
-                                        'with solvable: `{}` and other :`{}`'.format(
-                                        i.problemstr(), i.solvable, i.othersolvable))
-                                #import pdb; pdb.set_trace()
-                            else: 
-                                print('Problem allinfos not found `{}`'.format(i))
+                        td = s
+                    print("Compare solvables: `{}` to `{}`" \
+                            " remove: `{}`" \
+                            " and preserve: `{}`".format(s, other, td, preserve))
+                    found = self.remove_solvable_from_jobs(td, preserve)
+                    # a previous rule info may have removed it
+                    assert found or multifix
+                    self._learn_fix('SOLVER_RULE_PKG_SAME_NAME', s, other,
+                            {'op': 'remove_solvable', 'solvables': [str(td)], 'preserve': preserve})
+                    if not multifix:
+                        break
+                elif ri.type == solv.Solver.SOLVER_RULE_PKG_NOTHING_PROVIDES_DEP:
+                    print("SOLVER_RULE_PKG_NOTHING_PROVIDES_DEP")
+                    # example:
+                    # nothing provides python3.7dist(xmltodict) = 0.11.0 
+                    # needed by python3-pyvirtualize-0.9-6.20181003git57d2307.fc30.noarch
+                    print("Remove dep `{}` form solvable `{}`".format(ri.dep.str(), ri.solvable))
+                    self.remove_dep_from_solvable(ri.dep, ri.solvable)
+                    self._learn_fix('SOLVER_RULE_PKG_NOTHING_PROVIDES_DEP', ri.solvable, ri.dep.str(),
+                            {'op': 'remove_dep', 'solvables': [str(ri.solvable)], 'dep': ri.dep.str()})
+                    continue
+                elif ri.type == solv.Solver.SOLVER_RULE_PKG_REQUIRES:
+                    print('SOLVER_RULE_PKG_REQUIRES') 
+                    # example:
+                    # package prelude-correlator-5.0.1-1.fc30.x86_64 
+                    # requires python3-prelude-correlator >= 5.0.0, 
+                    # but none of the providers can be installed
+                    
+                    s = ri.solvable
+                    d = ri.dep
+                    # do not try to solve the same deps twice
+                    req = self.pool.whatprovides(d)
+                    key = '`{}` dep `{}`'.format(s, d)
+                    force = False
+                    if key in self.loop_control:
+                        # force solver solution
+                        # if we meet the same 
+                        # problem twice
+                        force = True
+                        #interactive(jobs, [problem])
+                        #import pdb; pdb.set_trace()
+                    
+                    self.loop_control.append(key)
+                    
+                    if len(req):
+                        # the rep exists ( add new job to selection )
+                        # add duplicated package, 
+                        # the SOLVER_RULE_PKG_SAME_NAME will handle
+                        # the issue later
+                        # req may contains the same package 
+                        # futher time
+                        self._fix_pkg_requires_problem(s, req, ri, problem, force=force)
+                        if not multifix:
+                            break
+                    else: 
+                        print('dep not found for solvable: `{}` dep: `{}`'.format(s, d))
+                        self.remove_dep_from_solvable(ri.dep, ri.solvable)
+                        self._learn_fix('SOLVER_RULE_PKG_REQUIRES', s, d.str(),
+                                {'op': 'remove_dep', 'solvables': [str(s)], 'dep': d.str()})
+                        if not multifix:
                             break
-                elif rule.type == solv.Solver.SOLVER_RULE_INFARCH:
-                    print('SOLVER_RULE_INFARCH')
-                    # from libsolv-bindings.txt
-                    # Infarch rules are also negative assertions, 
-                    # they disallow the installation of packages when 
-                    # there are packages of the same name 
-                    # but with a better architecture.
-                    # example: 
-                    # gcc-gfortran-9.0.1-0.10.fc30.i686 has inferior architecture
-                    print(rule.info().problemstr())
-                    s = rule.info().solvable
-                    self.remove_solvable_from_jobs(s)
-                elif rule.type == solv.Solver.SOLVER_RULE_JOB:
-                    print('SOLVER_RULE_JOB')
-                    # ??? conflicting requests
-                    print(rule.info().problemstr())
-                    s = rule.info().solvable
-                    self.remove_solvable_from_jobs(s)
-                else: 
-                    print('uknown rule {}'.format(rule.type))
+                elif ri.type == solv.Solver.SOLVER_RULE_PKG_CONFLICTS:
+                    print('SOLVER_RULE_PKG_CONFLICTS') 
+                    # example
+                    # package compat-openssl10-devel-1:1.0.2o-5.fc30.i686 
+                    # conflicts with openssl-devel provided 
+                    # by openssl-devel-1:1.1.1c-6.fc30.x86_64
+                    s = ri.solvable
+                    other = ri.othersolvable
+                    # remove conflicts to avoid problems resolution
+                    self.unset_conflicts(s)
+                    self.unset_conflicts(other)
+                    for c in (s, other):
+                        self._learn_fix('SOLVER_RULE_PKG_CONFLICTS', s, other,
+                                {'op': 'unset_conflicts', 'solvables': [str(c)]})
+                    if not multifix:
+                        break
+                elif ri.type == solv.Solver.SOLVER_RULE_PKG_OBSOLETES:
+                    print('SOLVER_RULE_PKG_OBSOLETES')
+                    # example
+                    # package infiniband-diags-2.0.0-2.el7.x86_64
+                    # obsoletes libibmad < 2.0.0-2.el7
+                    # provided by libibmad-1.3.13-1.el7.x86_64
+                    other = ri.othersolvable
+                    #s.unset(solv.SOLVABLE_OBSOLETES)
+                    self.remove_solvable_from_jobs(other)
+                    self._learn_fix('SOLVER_RULE_PKG_OBSOLETES', ri.solvable, other,
+                            {'op': 'remove_solvable', 'solvables': [str(other)]})
+                    if not multifix:
+                        break
+                else:
+                    print('uknown rule info {}'.format(ri.type))
                     #import pdb; pdb.set_trace()
                     exit(1)
+            else:
+                # for allinfos loop
+                if not rule_all_infos:
+                    i = rule.info()
+                    if i: 
+                        print('Problem allinfos not found: `{}` ' \
+                                'with solvable: `{}` and other :`{}`'.format(
+                                i.problemstr(), i.solvable, i.othersolvable))
+                        #import pdb; pdb.set_trace()
+                    else: 
+                        print('Problem allinfos not found `{}`'.format(i))
+                    return
+        elif rule.type == solv.Solver.SOLVER_RULE_INFARCH:
+            print('SOLVER_RULE_INFARCH')
+            # from libsolv-bindings.txt
+            # Infarch rules are also negative assertions, 
+            # they disallow the installation of packages when 
+            # there are packages of the same name 
+            # but with a better architecture.
+            # example: 
+            # gcc-gfortran-9.0.1-0.10.fc30.i686 has inferior architecture
+            print(rule.info().problemstr())
+            s = rule.info().solvable
+            self.remove_solvable_from_jobs(s)
+            self._learn_fix('SOLVER_RULE_INFARCH', s, '',
+                    {'op': 'remove_solvable', 'solvables': [str(s)]})
+        elif rule.type == solv.Solver.SOLVER_RULE_JOB:
+            print('SOLVER_RULE_JOB')
+            # ??? conflicting requests
+            print(rule.info().problemstr())
+            s = rule.info().solvable
+            self.remove_solvable_from_jobs(s)
+        else: 
+            print('uknown rule {}'.format(rule.type))
+            #import pdb; pdb.set_trace()
+            exit(1)
  
 class MultiversionProblemSolver(ProblemSolver):
     """
     this class mark all solvable as MULTIVERSION install
     it allows us to keep many solutions active at the same
     time
+    multiversion limits the MULTIVERSION install 
+    to a list of solvable ids (i.e. a jobs component)
     """
 
+    def __init__(self, pool, multiversion=None, **kwargs):
+        super().__init__(pool, **kwargs)
+        self.multiversion = multiversion
+
     def run_problem_loop(self, jobs):
         """
         wrap super run loop
         """
-        all_sel = self.pool.Selection_all()
+        if self.checkpoint:
+            # the checkpoint matches the request
+            # whatever the alignment round
+            self.checkpoint_key = self.checkpoint.key(jobs)
         # mark all solvable as multiversion
         # this allow to create a list of packages 
         # that can satisfy many profiles        
-        self.jobs = all_sel.jobs(solv.Job.SOLVER_MULTIVERSION) + jobs
+        if self.multiversion is None:
+            all_sel = self.pool.Selection_all()
+            multiversion_jobs = all_sel.jobs(solv.Job.SOLVER_MULTIVERSION)
+        else:
+            # one job per solvable: a whatprovides offset 
+            # (SOLVER_SOLVABLE_ONE_OF) is not valid 
+            # after createwhatprovides()
+            flags = solv.Job.SOLVER_MULTIVERSION | solv.Job.SOLVER_SOLVABLE
+            multiversion_jobs = [self.pool.Job(flags, sid) for sid in self.multiversion]
+        self.jobs = job_stack(self.pool, multiversion_jobs + jobs)
+        # solvable id -> solvables requiring it
+        self.rdeps = {}
 
         changed = True
         while changed:
+            # a resumed checkpoint restores the round 
+            # and the job stack aligned by the previous rounds
             solver = super().run_problem_loop(self.jobs)
-            self.build_job_cache()
+            if self.stats['rebuild']:
+                # the problem loop changed pool deps
+                self.rdeps = {}
             trans = solver.transaction()
             solvables = []
 
@@ -626,113 +1218,109 @@ class MultiversionProblemSolver(ProblemSolver):
                 solvables += cl.solvables()
             #import pdb; pdb.set_trace() 
             changed = self.__align_multiversion_pacakges(solvables) 
+            if changed:
+                self.round += 1
+                if self.checkpoint:
+                    # start of the next round
+                    self.loop_count = 0
+                    self.write_checkpoint()
         return solver
     
+    def align_merged(self, jobs):
+        """
+        align the solvables of jobs solved separately 
+        (i.e. merged jobs components) without solving them
+        return the aligned jobs to solve again
+        or None if the components are already aligned
+        """
+        self.jobs = job_stack(self.pool, jobs)
+        self.build_job_cache()
+        self.rdeps = {}
+        solvables = [s for job in jobs for s in job.solvables()]
+        if not self.__align_multiversion_pacakges(solvables):
+            return None
+        return self.jobs.jobs()
+
     def __lt(self, s, o):
-        return s.evrcmp(o) == 1
+        return self.evr.cmp(s, o) == 1
 
     def __gt(self, s, o):
-        return o.evrcmp(s) == 1
+        return self.evr.cmp(o, s) == 1
 
-    def __compare_solvables(self, ids, solvables, func, deps=False, update=False):
+    def __compare_solvables(self, ids, solvables, func):
         """
         Use dict to compare solvables sets
+        keep the solvable matching func for each name.arch
         """
-        # clear job stack of duplicated rpm name
-        ret = False
         for s in solvables:
-            str_name = s.lookup_str(solv.SOLVABLE_NAME)
-            str_arch = s.lookup_str(solv.SOLVABLE_ARCH)
-            na = "{}.{}".format(str_name, str_arch)
-            other, d = ids.get(na, (None, None))
-            changed = False
-            if other is not None:
-                if func(s, other):
-                    # remove other
-                    keep = s
-                    changed = True
-                    if deps:
-                        d = self.__get_solvable_deps(keep)
-                else:
-                    # remove solvable
-                    keep = other
-                    if deps and d is None and not update:
-                        # update only if needed
-                        d = self.__get_solvable_deps(keep)
-                ids[na] = (keep, d)
-                if changed:
-                    ret = changed
-                
-                logger.debug("Compare `{}` to `{}` using `{}` function " \
-                        "keep: `{}` changed: `{}`.".format(s, other, func, keep, changed))
-            elif not update: 
-                ids[na] = (s, d)
-        return ret
-
-    def __merge_ids(self, idsa, idsb):
-        """
-        upsert idsb in idsa
-        keep the best solvable of each
-        """
-        solvables = []
-        for solvable, deps in idsb.values():
-            solvables.append(solvable)
-        changed = self.__compare_solvables(idsa, solvables, 
-                self.__lt, deps=True, update=True)
-        return changed 
+            na = (s.nameid, s.archid)
+            other = ids.get(na, None)
+            if other is None or func(s, other):
+                ids[na] = s
 
     def __align_multiversion_pacakges(self, solvables):
         """
         Read solver results in order to align solvable
         return jobs form aligned packages
+
+        worklist propagation: when a solvable is kept
+        the solvables requiring it are checked once,
+        a newer version of an already kept name.arch
+        replaces it and goes to the next round
         """
         ids = {}
         # keep the hightest version
         # of each solvable in ids
-        count = 0
-        print("Deps propagation loop: `{}` deps: `{}`".format(count, 0))
-        changed = self.__compare_solvables(ids, solvables, self.__lt, deps=True)
-        old_deps = []
+        self.__compare_solvables(ids, solvables, self.__lt)
+        worklist = [s.id for s in ids.values()]
+        # solvable ids whose reverse deps were checked
+        visited = set()
+        rounds = 0
         ret = False
-        while changed:
-            count += 1
-            deps = []
-            for s, d in ids.values():
-                if d and d not in deps and d not in old_deps:
-                    deps.append(d)
-            print("Deps propagation loop: `{}` deps: `{}` " \
-                    "changed: `{}`, ret: `{}`".format(count, len(deps), changed, ret))
-            changed = False
-            for d in deps:
-                dep_ids = {}
-                # keep le lowest version of each dep 
-                self.__compare_solvables(dep_ids, d, self.__lt)
-                # merge ids with its own deps
-                r = self.__merge_ids(ids, dep_ids)
-                if r:
-                    changed = True
-                    ret = True
-            old_deps += deps
+        while worklist:
+            rounds += 1
+            logger.debug("Deps propagation round: `{}` " \
+                    "worklist: `{}`".format(rounds, len(worklist)))
+            next_worklist = []
+            for solvable_id in worklist:
+                if solvable_id in visited:
+                    continue
+                visited.add(solvable_id)
+                solvable = self.pool.solvables[solvable_id]
+                if ids[(solvable.nameid, solvable.archid)].id != solvable_id:
+                    # replaced by a newer version
+                    continue
+                for o in self.__get_solvable_deps(solvable):
+                    na = (o.nameid, o.archid)
+                    other = ids.get(na, None)
+                    if other is not None and self.__lt(o, other):
+                        logger.debug("Align `{}` to `{}`".format(other, o))
+                        ids[na] = o
+                        next_worklist.append(o.id)
+                        ret = True
+            worklist = next_worklist
+        print("Deps propagation rounds: `{}` solvables: `{}` " \
+                "changed: `{}`".format(rounds, len(visited), ret))
         
         # all solvables dep are aligned each others
         # update job stack from ids
         default_flags = solv.Job.SOLVER_INSTALL | solv.Job.SOLVER_TARGETED
-        for solvable, deps in ids.values():
+        for solvable in ids.values():
             for idx, job, o in self.search_solvables_from_cache(name=solvable.name, arch=solvable.arch):
                 # import pdb; pdb.set_trace() 
-                if solvable.evrcmp(o) == 1:
+                if self.evr.cmp(solvable, o) == 1:
                     # replace/update job
                     how = job.how & solv.Job.SOLVER_JOBMASK
                     flags = how | solv.Job.SOLVER_SOLVABLE
                     newjob = self.pool.Job(flags, solvable.id)
-                    self.jobs[idx] = newjob
+                    self.set_job(idx, newjob)
                     print("Replace job `{}` with `{}` for dependencies alignment".format(job, newjob))
                     break
             else: 
                 # the loop did no break
                 newjob = self.pool.Job(default_flags | solv.Job.SOLVER_SOLVABLE, solvable.id)
                 print("Create job `{}` for dependencies alignment".format(newjob))
-                self.jobs.append(newjob)
+                self.add_job(newjob)
         return ret
         
 
@@ -740,9 +1328,13 @@ class MultiversionProblemSolver(ProblemSolver):
         """
         Return an array of solvables
         that depends of input solvable
+        (memoized until the pool deps change)
         """
-        ret = self.pool.whatmatchessolvable(solv.SOLVABLE_REQUIRES, solvable)
-        logger.debug("Retrieve sovlables' `{}` deps: `{}`".format(solvable, ret))
+        ret = self.rdeps.get(solvable.id, None)
+        if ret is None:
+            ret = self.pool.whatmatchessolvable(solv.SOLVABLE_REQUIRES, solvable)
+            self.rdeps[solvable.id] = ret
+            logger.debug("Retrieve sovlables' `{}` deps: `{}`".format(solvable, ret))
         return ret
 
 
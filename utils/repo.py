@@ -13,15 +13,28 @@ import os
 import tempfile
 import time
 import re
+import concurrent.futures
+import json
 
-from urllib import request
+from utils import connection
+from utils.cache import solv_cache
+
+import logging
+
+logger = logging.getLogger(__name__)
 #import gc
 #gc.set_debug(gc.DEBUG_LEAK)
 
 class repo_generic(dict):
-    def __init__(self, name, type, attribs = {}, **kwargs):
+    # download chunk size
+    download_bufsize = 1024 * 1024
+
+    def __init__(self, name, type, attribs = {}, cache = None, **kwargs):
         for k in attribs:
             self[k] = attribs[k]
+        if cache is None:
+            cache = solv_cache()
+        self.cache = cache
         self.extra_vars = kwargs
         self.name = name
         self.type = type
@@ -78,32 +91,71 @@ class repo_generic(dict):
             return int(expire)
 
     def cachepath(self, ext = None):
-        path = re.sub(r'^\.', '_', self.name)
+        """
+        solv files are keyed by cookie
+        return None if the cookie is not known yet
+        """
         if ext:
-            path += "_" + ext + ".solvx"
+            cookie = self.get('extcookie', '')
         else:
-            path += ".solv"
-        return "/var/cache/solv/" + re.sub(r'[/]', '_', path)
+            cookie = self.get('cookie', '')
+        if not cookie:
+            return None
+        return self.cache.objpath(cookie, ext)
         
+    def validatorspath(self):
+        """
+        http validators (ETag/Last-Modified) of repomd.xml
+        are stored next to the repo cookie ref
+        """
+        return self.cache.refpath(self.name, '.validators')
+
+    def readvalidators(self):
+        try:
+            cookie, mtime = self.cache.readref(self.name)
+            if not cookie or not os.path.exists(self.cache.objpath(cookie)):
+                return {}
+            with open(self.validatorspath(), 'r') as f:
+                return json.load(f)
+        except (OSError, IOError, ValueError):
+            return {}
+
+    def writevalidators(self, validators):
+        if 'incomplete' in self:
+            return
+        validators = {k: validators.get(k, None) for k in ('etag', 'last_modified')}
+        if not any(validators.values()):
+            return
+        self.cache.write(self.validatorspath(), json.dumps(validators))
+
+    def cachedcookie(self):
+        """
+        return the cookie of the latest refresh
+        or None if the metadata expired
+        """
+        refcookie, mtime = self.cache.readref(self.name)
+        if not refcookie:
+            return None
+        if bool(int(self['autorefresh'])):
+            metadata_expire = self.get('metadata_expire',"1h")
+            expire = self.format_expire_time(metadata_expire)
+            if expire != -1 and time.time() - mtime >= expire:
+                return None
+        return refcookie
+
     def load(self, pool):
         self.handle = pool.add_repo(self.name)
         self.handle.appdata = self
         self.handle.priority = 99 - self['priority']
-        dorefresh = bool(int(self['autorefresh']))
-        if dorefresh:
-            try:
-                st = os.stat(self.cachepath())
-                metadata_expire = self.get('metadata_expire',"1h")
-                expire = self.format_expire_time(metadata_expire)
-                if expire == -1 or time.time() - st.st_mtime < expire:
-                    dorefresh = False
-            except OSError:
-                pass
+        refcookie = self.cachedcookie()
         self['cookie'] = ''
         self['extcookie'] = ''
-        if not dorefresh and self.usecachedrepo(None):
-            print("repo: '%s': cached" % self.name)
-            return True
+        if refcookie:
+            self['cookie'] = refcookie
+            if self.usecachedrepo(None):
+                print("repo: '%s': cached" % self.name)
+                return True
+            self['cookie'] = ''
         return False
 
     def load_ext(self, repodata):
@@ -171,7 +223,15 @@ class repo_generic(dict):
             url = re.sub(r"\${}".format(key), val, url)
         return url
 
-    def download(self, file, uncompress, chksum, markincomplete=False):
+    def download(self, file, uncompress, chksum, markincomplete=False, validators=None):
+        """
+        Download file from the repository
+
+        validators is an optional dict of `etag` and `last_modified` 
+        values used to send a conditional request.
+        It is updated from the response headers, on 304 Not Modified
+        `notmodified` is set and None is returned
+        """
         url = None
         if 'baseurl' not in self:
             if 'metalink' in self:
@@ -191,11 +251,7 @@ class repo_generic(dict):
                 print("%s: no baseurl" % self.name)
                 return None
             url = re.sub(r'/$', '', self['baseurl']) + '/' + file
-        f = tempfile.TemporaryFile(mode='wb')
-        real_url = self.sub_url(url)
-        mem_f = request.urlopen(real_url).read()
-        f.write(mem_f)
-        f.seek(0)
+        fchksum = None
         if chksum:
             fchksum = solv.Chksum(chksum.type)
             if not fchksum:
@@ -203,7 +259,39 @@ class repo_generic(dict):
                 if markincomplete:
                     self['incomplete'] = True
                 return None
-            fchksum.add_fd(f.fileno())
+        f = tempfile.TemporaryFile(mode='w+b')
+        real_url = self.sub_url(url)
+        # stream the payload to the temporary file
+        # one buffer at a time and update the checksum
+        # as bytes arrive
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        with connection.pool.urlopen(real_url, headers) as response:
+            if response.status == 304 and validators is not None:
+                response.read()
+                validators['notmodified'] = True
+                # a 304 may carry updated validators
+                validators['etag'] = response.headers.get('ETag') or validators.get('etag')
+                validators['last_modified'] = response.headers.get('Last-Modified') \
+                        or validators.get('last_modified')
+                return None
+            if validators is not None:
+                validators['etag'] = response.headers.get('ETag')
+                validators['last_modified'] = response.headers.get('Last-Modified')
+            while True:
+                buf = response.read(self.download_bufsize)
+                if not buf:
+                    break
+                f.write(buf)
+                if fchksum:
+                    fchksum.add(buf)
+        f.flush()
+        f.seek(0)
+        if fchksum:
             # force .hex() methode to avoid "<type>:unfinished" hash
             fchksum.hex()
 
@@ -220,6 +308,8 @@ class repo_generic(dict):
     def usecachedrepo(self, ext, mark=False):
         try: 
             repopath = self.cachepath(ext)
+            if not repopath:
+                return False
             f = open(repopath, 'rb')
             f.seek(-32, os.SEEK_END)
             fcookie = f.read(32)
@@ -248,12 +338,11 @@ class repo_generic(dict):
             if self.type != 'system' and not ext:
                 self['cookie'] = fcookie
                 self['extcookie'] = fextcookie
-            if mark:
-                # no futimes in python?
-                try:
-                    os.utime(repopath, None)
-                except Exception:
-                    pass
+            # keep track of the last use for cache eviction
+            self.cache.touch(repopath)
+            if mark and not ext:
+                # reset the metadata expiration
+                self.cache.touch(self.cache.refpath(self.name))
         except IOError:
             return False
         return True
@@ -263,9 +352,7 @@ class repo_generic(dict):
             return
         tmpname = None
         try:
-            if not os.path.isdir("/var/cache/solv"):
-                os.mkdir("/var/cache/solv", 0o755)
-            (fd, tmpname) = tempfile.mkstemp(prefix='.newsolv-', dir='/var/cache/solv')
+            (fd, tmpname) = self.cache.mkstemp(prefix='.newsolv-')
             os.fchmod(fd, 0o444)
             f = os.fdopen(fd, 'wb+')
             f = solv.xfopen_fd(None, f.fileno())
@@ -306,8 +393,11 @@ class repo_generic(dict):
                         flags |= solv.Repo.REPO_LOCALPOOL
                     repodata.add_solv(nf, flags)
             os.rename(tmpname, self.cachepath(ext))
+            if not ext:
+                self.cache.writeref(self.name, self['cookie'])
+            self.cache.evict()
         except (OSError, IOError):
-            if tmpname:
+            if tmpname and os.path.exists(tmpname):
                 os.unlink(tmpname)
 
     def updateaddedprovides(self, addedprovides):
@@ -360,7 +450,18 @@ class repo_repomd(repo_generic):
             return True
         sys.stdout.write("rpmmd repo '%s': " % self.name)
         sys.stdout.flush()
-        f = self.download("repodata/repomd.xml", False, None, None)
+        validators = self.readvalidators()
+        f = self.download("repodata/repomd.xml", False, None, None, validators)
+        if not f and validators.get('notmodified'):
+            # repomd.xml did not change since the last refresh
+            # reuse the cached cookie
+            self['cookie'] = self.cache.readref(self.name)[0] or ''
+            if self.usecachedrepo(None, True):
+                self.writevalidators(validators)
+                print("cached (not modified)")
+                return True
+            validators = {}
+            f = self.download("repodata/repomd.xml", False, None, None, validators)
         if not f:
             print("no repomd.xml file, skipped")
             self.handle.free(True)
@@ -368,6 +469,7 @@ class repo_repomd(repo_generic):
             return False
         self['cookie'] = self.calc_cookie_fp(f)
         if self.usecachedrepo(None, True):
+            self.writevalidators(validators)
             print("cached")
             return True
         self.handle.add_repomdxml(f, 0)
@@ -386,6 +488,7 @@ class repo_repomd(repo_generic):
                 self.handle.add_updateinfoxml(f, 0)
         self.add_exts()
         self.writecachedrepo(None)
+        self.writevalidators(validators)
         # must be called after writing the repo
         self.handle.create_stubs()
         return True
@@ -470,7 +573,11 @@ class repo_system(repo_generic):
         print("reading")
         if hasattr(self.handle.__class__, 'add_products'):
             self.handle.add_products("/etc/products.d", solv.Repo.REPO_NO_INTERNALIZE)
-        f = solv.xfopen(self.cachepath())
+        # reuse the previous rpmdb cache as reference
+        f = None
+        refcookie, mtime = self.cache.readref(self.name)
+        if refcookie:
+            f = solv.xfopen(self.cache.objpath(refcookie))
         self.handle.add_rpmdb_reffp(f, solv.Repo.REPO_REUSE_REPODATA)
         self.writecachedrepo(None)
         return True
@@ -490,6 +597,46 @@ class repo_cmdline(repo_generic):
         self.handle.appdata = self 
         return True
 
+def prefetch_repo(repo, basearch):
+    """
+    Download, check and parse a repository 
+    into its solv cache file using a private pool
+    the filelists extension is prefetched as well
+    (the main process loads it from addfileprovides)
+    """
+    pool = solv.Pool()
+    pool.setarch(basearch)
+    pool.set_loadcallback(load_stub)
+    try:
+        if not repo.load(pool):
+            return False
+        # walking the file lists loads the FL stub
+        # which writes the extension solv cache file
+        for d in repo.handle.Dataiterator(solv.SOLVABLE_FILELIST, None, 0):
+            break
+        return True
+    finally:
+        pool.free()
+
+def prefetch_repos(repos, basearch, jobs):
+    """
+    Populate repos' solv cache files from a process pool
+    the caller only has to load the cached files
+    into its own pool afterward
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for repo in repos:
+            futures[executor.submit(prefetch_repo, repo, basearch)] = repo
+        for future in concurrent.futures.as_completed(futures):
+            repo = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                # the main loop will load the repo 
+                # the usual way
+                logger.warning('Failed to prefetch repo `{}`: {}'.format(repo.name, e))
+
 def load_stub(repodata):
     repo = repodata.repo.appdata
     if repo:
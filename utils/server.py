@@ -0,0 +1,180 @@
+import os
+import json
+import stat
+import threading
+import socketserver
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class solve_request_handler(BaseHTTPRequestHandler):
+    """
+    POST /
+      {"packages": ["bash", "repo:updates:patch:*"], "weak": false, "reportupdateinfo": false}
+      returns the data_json report
+    GET /status
+      returns the loaded repos cookies
+    """
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_json(404, {'error': 'not found'})
+            return
+        self.send_json(200, self.server.service.status())
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            req = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            self.send_json(400, {'error': 'invalid json request'})
+            return
+        code, payload = self.server.service.solve(req)
+        self.send_json(code, payload)
+
+    def address_string(self):
+        if not self.client_address:
+            # unix socket
+            return 'unix'
+        return super().address_string()
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s" % (self.address_string(), format % args))
+
+class unix_http_server(socketserver.UnixStreamServer):
+    pass
+
+class solve_service(object):
+    """
+    Keep a loaded pool in memory to answer solve requests
+    the pool is reloaded in background when repos metadata expire
+    """
+    # seconds between two repo cookies checks
+    refresh_interval = 60
+
+    def __init__(self, load, solve):
+        """
+        load() returns a new (pool, repos) tuple
+        solve(pool, repos, packages, weak, updateinfo) returns data_json report
+        """
+        self.load = load
+        self.solve_packages = solve
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.pool, self.repos = load()
+
+    def expired(self):
+        for repo in self.repos:
+            if hasattr(repo, 'handle') and repo.cachedcookie() != repo['cookie']:
+                logger.info('Repo `{}` metadata expired'.format(repo.name))
+                return True
+        return False
+
+    def refresh_loop(self):
+        while not self.stopped.wait(self.refresh_interval):
+            if not self.expired():
+                continue
+            try:
+                pool, repos = self.load()
+            except Exception:
+                logger.exception('Failed to reload repos')
+                continue
+            with self.lock:
+                old = self.pool
+                self.pool, self.repos = pool, repos
+            old.free()
+            logger.info('Pool reloaded')
+
+    def status(self):
+        with self.lock:
+            repos = {}
+            for repo in self.repos:
+                if hasattr(repo, 'handle'):
+                    repos[repo.name] = repo['cookie'].hex()
+            return {'repos': repos}
+
+    def solve(self, req):
+        packages = req.get('packages', None) if isinstance(req, dict) else None
+        if not packages or not isinstance(packages, list) \
+                or not all(isinstance(p, str) for p in packages):
+            return 400, {'error': '`packages` must be a list of strings'}
+        weak = bool(req.get('weak', False))
+        updateinfo = bool(req.get('reportupdateinfo', False))
+        with self.lock:
+            try:
+                data = self.solve_packages(self.pool, self.repos, packages,
+                        weak=weak, updateinfo=updateinfo)
+            except SystemExit:
+                # the job solver exits on invalid queries
+                return 400, {'error': 'invalid packages query'}
+            except AssertionError as e:
+                return 500, {'error': str(e)}
+        if data is None:
+            data = []
+        return 200, data
+
+    @staticmethod
+    def parse_address(address):
+        """
+        address: `unix:/path/to/socket` or `host:port`
+        return ('unix', path) or (host, port)
+        raise ValueError on invalid addresses
+        (checked before the pool load)
+        """
+        if address.startswith('unix:'):
+            path = address[len('unix:'):]
+            if not path:
+                raise ValueError('Missing unix socket path: `{}`'.format(address))
+            try:
+                mode = os.lstat(path).st_mode
+            except FileNotFoundError:
+                pass
+            else:
+                if not stat.S_ISSOCK(mode):
+                    # do not remove a regular file
+                    raise ValueError('`{}` exists and is not a socket'.format(path))
+            return 'unix', path
+        host, sep, port = address.rpartition(':')
+        if not sep or not port.isdigit() or int(port) > 65535:
+            raise ValueError('Invalid address `{}` ' \
+                    'expected `unix:/path` or `host:port`'.format(address))
+        host = host or '127.0.0.1'
+        if host not in ('localhost', '127.0.0.1'):
+            raise ValueError('Only localhost addresses are allowed: `{}`'.format(host))
+        return host, int(port)
+
+    def serve(self, address):
+        """
+        address: `unix:/path/to/socket` or `host:port`
+        """
+        server_address = self.parse_address(address)
+        if server_address[0] == 'unix':
+            path = server_address[1]
+            if os.path.lexists(path):
+                # stale socket of a previous run
+                os.unlink(path)
+            server = unix_http_server(path, solve_request_handler)
+        else:
+            server = HTTPServer(server_address, solve_request_handler)
+        server.service = self
+
+        refresh = threading.Thread(target=self.refresh_loop, daemon=True)
+        refresh.start()
+        logger.warning('Serve solve requests on `{}`'.format(address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopped.set()
+            server.server_close()
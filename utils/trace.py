@@ -0,0 +1,41 @@
+import os
+import json
+import solv
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# rule and rule info type value -> SOLVER_RULE_* name
+_rule_names = {}
+
+def rule_type_name(rule_type):
+    if not _rule_names:
+        for name in sorted(dir(solv.Solver)):
+            if name.startswith('SOLVER_RULE_') and name != 'SOLVER_RULE_TYPEMASK':
+                _rule_names.setdefault(getattr(solv.Solver, name), name)
+    return _rule_names.get(rule_type, str(rule_type))
+
+class problem_trace(object):
+    """
+    JSONL trace of the problem loop
+    one record per loop iteration
+
+    records are written with a single write() call
+    on an O_APPEND file so forked workers
+    can share the trace
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY|os.O_CREAT|os.O_TRUNC|os.O_APPEND, 0o644)
+
+    def write(self, record):
+        record['pid'] = os.getpid()
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        os.write(self.fd, line.encode('utf-8'))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None